@@ -5,93 +5,513 @@ Advanced analytics using ML models and statistical analysis
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-import json
-from sklearn.linear_model import LinearRegression
+import os
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from sklearn.ensemble import RandomForestRegressor
+from scipy.signal import lfilter
+from data_store import get_store
+from campaign_store import CAMPAIGN_FACTS_PATH, CampaignFactStore
+from sentiment_trends import SENTIMENT_LABELS, SentimentTrends, label_codes, summarise
+from sentiment_classifier import get_classifier
+from posting_schedule import DEFAULT_SCHEDULE, PostingSchedule
 import warnings
 warnings.filterwarnings('ignore')
 
+FORECAST_TREES = 100
+FORECAST_HORIZON = 7
+FORECAST_CACHE_SIZE = 256
+# Appending up to this many points to a cached history extends its forest instead of refitting
+FORECAST_WARM_START_POINTS = 7
+FORECAST_WARM_START_TREES = 20
+FORECAST_MAX_TREES = 300
+# Batch forecasts: weekly seasonality, small ridge penalty so short or flat series stay solvable
+FORECAST_SEASON = 7
+FORECAST_RIDGE = 1e-3
+# Anomalies: |z| above these is medium / high severity; no flags until a stream has this many points
+ANOMALY_Z = 2.0
+ANOMALY_Z_HIGH = 3.0
+ANOMALY_MIN_POINTS = 5
+ANOMALY_EWMA_ALPHA = 0.1
+CAMPAIGN_METRICS = ('ad_spend', 'revenue_estimate', 'conversions', 'clicks')
+# Windowed campaign totals: hourly buckets covering the last 7 days
+CAMPAIGN_BUCKET_SECONDS = 3600
+CAMPAIGN_BUCKETS = 7 * 24
+
+
+def history_key(values):
+    """Stable hash of a numeric series"""
+    return hashlib.sha1(np.asarray(values, dtype=np.float64).tobytes()).hexdigest()
+
+
+class ForecastCache:
+    """Thread-safe LRU of fitted forecast models keyed by the hash of their training history.
+
+    Cached forests are never refitted in place: warm-starting works on a copy,
+    so concurrent requests can predict from an entry while another extends it.
+    """
+
+    def __init__(self, max_size=FORECAST_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.warm_starts = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def peek(self, key):
+        """Lookup without touching recency or hit counters (used for warm-start candidates)"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, entry, warm_started=False):
+        with self._lock:
+            self.warm_starts += warm_started
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'warm_starts': self.warm_starts,
+                'evictions': self.evictions
+            }
+
+
+def anomaly_records(values, z_scores, means, offset=0):
+    """Anomaly dicts (detect_anomalies shape) for points whose |z| exceeds ANOMALY_Z"""
+    flagged = np.nonzero(np.abs(z_scores) > ANOMALY_Z)[0]
+    return [{
+        'index': int(offset + i),
+        'value': float(values[i]),
+        'severity': 'high' if abs(z_scores[i]) > ANOMALY_Z_HIGH else 'medium',
+        'type': 'spike' if values[i] > means[i] else 'drop'
+    } for i in flagged]
+
+
+def _z(values, means, variances):
+    std = np.sqrt(np.maximum(variances, 0))
+    return np.divide(values - means, std, out=np.zeros_like(values), where=std > 0)
+
+
+class StreamingAnomalyDetector:
+    """Online anomaly detection over many named metric streams
+
+    Each point is scored against the statistics of the points before it, then
+    folded in, so an update costs O(1) and history is never rescanned.
+    mode='welford' keeps the exact running mean/variance of the whole stream
+    (what detect_anomalies measures against); mode='ewma' keeps exponentially
+    weighted ones that follow level shifts. State is held in arrays indexed
+    by stream, so a tick across thousands of streams is one vectorised update.
+    """
+
+    def __init__(self, mode='welford', alpha=ANOMALY_EWMA_ALPHA, min_points=ANOMALY_MIN_POINTS):
+        if mode not in ('welford', 'ewma'):
+            raise ValueError(f"Unknown anomaly mode '{mode}', expected 'welford' or 'ewma'")
+        self.mode = mode
+        self.alpha = alpha
+        self.min_points = min_points
+        self._streams = {}
+        self._count = np.zeros(0, dtype=np.int64)
+        self._mean = np.zeros(0)
+        # Welford: sum of squared deviations (M2); EWMA: the weighted variance itself
+        self._spread = np.zeros(0)
+        self._lock = threading.Lock()
+
+    def _index(self, stream):
+        i = self._streams.get(stream)
+        if i is None:
+            i = self._streams[stream] = len(self._streams)
+            if i >= len(self._count):
+                grow = max(16, len(self._count))
+                self._count = np.concatenate([self._count, np.zeros(grow, dtype=np.int64)])
+                self._mean = np.concatenate([self._mean, np.zeros(grow)])
+                self._spread = np.concatenate([self._spread, np.zeros(grow)])
+        return i
+
+    def _variance(self, count, spread):
+        if self.mode == 'ewma':
+            return spread
+        return np.divide(spread, count, out=np.zeros_like(spread), where=count > 0)
+
+    def update(self, stream, value):
+        """Ingest one point; returns its anomaly dict or None"""
+        anomalies = self.update_batch(stream, [value])
+        return anomalies[0] if anomalies else None
+
+    def update_batch(self, stream, values):
+        """Ingest points for one stream in order; returns anomaly dicts indexed by stream position"""
+        x = np.asarray(values, dtype=np.float64).ravel()
+        if not len(x):
+            return []
+        with self._lock:
+            i = self._index(stream)
+            n0, mean0, spread0 = int(self._count[i]), self._mean[i], self._spread[i]
+            if self.mode == 'welford':
+                # Running stats after each prefix, shifted by mean0 to avoid cancellation
+                d = x - mean0
+                n = n0 + np.arange(1, len(x) + 1)
+                s1, s2 = np.cumsum(d), np.cumsum(d * d)
+                means = mean0 + s1 / n
+                spreads = spread0 + s2 - s1 * s1 / n
+            else:
+                a = self.alpha
+                start = x[0] if n0 == 0 else mean0
+                means = lfilter([a], [1, a - 1], x, zi=[(1 - a) * start])[0]
+                prev = np.concatenate([[start], means[:-1]])
+                spreads = lfilter([1 - a], [1, a - 1], a * (x - prev) ** 2, zi=[(1 - a) * spread0])[0]
+            # Score each point against the state before it
+            counts_before = n0 + np.arange(len(x))
+            means_before = np.concatenate([[mean0], means[:-1]])
+            variances_before = self._variance(counts_before, np.concatenate([[spread0], spreads[:-1]]))
+            self._count[i], self._mean[i], self._spread[i] = n0 + len(x), means[-1], spreads[-1]
+        z = np.where(counts_before >= self.min_points, _z(x, means_before, variances_before), 0.0)
+        return anomaly_records(x, z, means_before, offset=n0)
+
+    def update_streams(self, values):
+        """Ingest one point for each of several streams ({stream: value}); returns {stream: anomaly}"""
+        with self._lock:
+            idx = np.array([self._index(stream) for stream in values])
+            x = np.fromiter(values.values(), dtype=np.float64, count=len(values))
+            n0, mean0, spread0 = self._count[idx], self._mean[idx], self._spread[idx]
+            z = np.where(n0 >= self.min_points, _z(x, mean0, self._variance(n0, spread0)), 0.0)
+            if self.mode == 'welford':
+                n = n0 + 1
+                delta = x - mean0
+                mean = mean0 + delta / n
+                spread = spread0 + delta * (x - mean)
+            else:
+                a = self.alpha
+                first = n0 == 0
+                delta = np.where(first, 0.0, x - mean0)
+                mean = np.where(first, x, mean0 + a * delta)
+                spread = (1 - a) * (spread0 + a * delta * delta)
+            self._count[idx], self._mean[idx], self._spread[idx] = n0 + 1, mean, spread
+        streams = list(values)
+        flagged = np.nonzero(np.abs(z) > ANOMALY_Z)[0]
+        # Index within each stream, as update_batch reports it
+        return {streams[k]: dict(record, index=int(n0[k])) for k, record in zip(flagged, anomaly_records(x, z, mean0))}
+
+    def stats(self, stream):
+        i = self._streams.get(stream)
+        if i is None:
+            return None
+        count = self._count[i:i + 1]
+        return {
+            'count': int(count[0]),
+            'mean': float(self._mean[i]),
+            'std': float(np.sqrt(self._variance(count, self._spread[i:i + 1])[0]))
+        }
+
+    @staticmethod
+    def zscores(values):
+        """Backfill: z-scores of a whole series (or each row of a 2-D array) against its own mean/std"""
+        values = np.asarray(values, dtype=np.float64)
+        means = values.mean(axis=-1, keepdims=True)
+        return _z(values, np.broadcast_to(means, values.shape), np.broadcast_to(values.var(axis=-1, keepdims=True), values.shape))
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def roi_metrics(total_spent, total_revenue):
+    """ROI summary in the shape calculate_roi returns"""
+    roi = ((total_revenue - total_spent) / total_spent * 100) if total_spent > 0 else 0
+    return {
+        'roi': round(roi, 2),
+        'total_revenue': total_revenue,
+        'total_spent': total_spent,
+        'profit': total_revenue - total_spent,
+        'roas': round(total_revenue / total_spent, 2) if total_spent > 0 else 0
+    }
+
+
+class CampaignAggregates:
+    """Running campaign totals, overall and per campaign, updated in O(1) per change
+
+    Changes are also added to hourly buckets (a ring of `n_buckets`), so
+    totals over the last N hours are a sum over a fixed number of buckets,
+    independent of how many campaigns or events there are. The first sync is
+    treated as the starting state, not as activity inside the window.
+    """
+
+    def __init__(self, bucket_seconds=CAMPAIGN_BUCKET_SECONDS, n_buckets=CAMPAIGN_BUCKETS):
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = n_buckets
+        self.totals = dict.fromkeys(CAMPAIGN_METRICS, 0)
+        self.campaigns = {}
+        self._buckets = self._new_buckets()
+        self._campaign_buckets = {}
+        self._synced = False
+        self._lock = threading.RLock()
+
+    def _new_buckets(self):
+        return np.full(self.n_buckets, -1, dtype=np.int64), np.zeros((self.n_buckets, len(CAMPAIGN_METRICS)))
+
+    def _apply(self, name, delta, timestamp, windowed):
+        for metric, change in delta.items():
+            self.totals[metric] += change
+        if not windowed or not any(delta.values()):
+            return
+        bucket = int((timestamp if timestamp is not None else time.time()) // self.bucket_seconds)
+        slot = bucket % self.n_buckets
+        vector = np.array([delta[m] for m in CAMPAIGN_METRICS], dtype=np.float64)
+        if name not in self._campaign_buckets:
+            self._campaign_buckets[name] = self._new_buckets()
+        for ids, values in (self._buckets, self._campaign_buckets[name]):
+            if ids[slot] != bucket:
+                ids[slot] = bucket
+                values[slot] = 0
+            values[slot] += vector
+
+    def set_campaign(self, name, record, timestamp=None, windowed=True):
+        """Replace a campaign's totals with `record` (a campaign_tracking entry)"""
+        new = {m: record.get(m, 0) for m in CAMPAIGN_METRICS}
+        with self._lock:
+            old = self.campaigns.get(name, dict.fromkeys(CAMPAIGN_METRICS, 0))
+            self.campaigns[name] = new
+            self._apply(name, {m: new[m] - old[m] for m in CAMPAIGN_METRICS}, timestamp, windowed)
+
+    def record_event(self, name, timestamp=None, **deltas):
+        """Add increments (e.g. clicks=1, conversions=1) to a campaign"""
+        with self._lock:
+            current = self.campaigns.setdefault(name, dict.fromkeys(CAMPAIGN_METRICS, 0))
+            delta = {m: deltas.get(m, 0) for m in CAMPAIGN_METRICS}
+            for metric, change in delta.items():
+                current[metric] += change
+            self._apply(name, delta, timestamp, windowed=True)
+
+    def remove_campaign(self, name):
+        with self._lock:
+            old = self.campaigns.pop(name, None)
+            self._campaign_buckets.pop(name, None)
+            if old is not None:
+                self._apply(name, {m: -v for m, v in old.items()}, None, windowed=False)
+
+    def sync(self, campaign_data):
+        """Bring the totals in line with a campaign_tracking dict, touching only campaigns that changed"""
+        with self._lock:
+            windowed = self._synced
+            for name, record in campaign_data.items():
+                current = self.campaigns.get(name)
+                if current is None or any(current[m] != record.get(m, 0) for m in CAMPAIGN_METRICS):
+                    self.set_campaign(name, record, windowed=windowed)
+            for name in [n for n in self.campaigns if n not in campaign_data]:
+                self.remove_campaign(name)
+            self._synced = True
+
+    def window_totals(self, hours, campaign=None, now=None):
+        """Totals of changes recorded in the last `hours` hours, overall or for one campaign"""
+        with self._lock:
+            ids, values = self._buckets if campaign is None else self._campaign_buckets.get(campaign, self._new_buckets())
+            current = int((now if now is not None else time.time()) // self.bucket_seconds)
+            span = int(np.ceil(hours * 3600 / self.bucket_seconds))
+            mask = (ids > current - span) & (ids <= current)
+            sums = values[mask].sum(axis=0)
+        return {m: _number(v) for m, v in zip(CAMPAIGN_METRICS, sums)}
+
+    def roi(self, campaign=None, hours=None):
+        """calculate_roi-shaped metrics from the running (or windowed) totals"""
+        if hours is not None:
+            totals = self.window_totals(hours, campaign)
+        else:
+            with self._lock:
+                totals = dict(self.totals if campaign is None else self.campaigns.get(campaign, {}))
+        return roi_metrics(totals.get('ad_spend', 0), totals.get('revenue_estimate', 0))
+
+
 class AIAnalyticsEngine:
     def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+        self.forecasts = ForecastCache()
+        # Live click/conversion streams, e.g. anomalies.update_streams({'delivery_campaign:clicks': 42, ...})
+        self.anomalies = StreamingAnomalyDetector()
+        self.aggregates = CampaignAggregates()
+        self._aggregates_version = None
+        # Streamed comment sentiment, e.g. sentiment.ingest(comments); sentiment.trends(window=3600)
+        self.sentiment = SentimentTrends()
+        # Hour-of-week engagement histograms fed by record_engagement()
+        self.schedule = PostingSchedule()
+        # Daily per-campaign history (empty until facts are appended or a saved store exists)
+        self.facts = CampaignFactStore.load(CAMPAIGN_FACTS_PATH) if os.path.exists(CAMPAIGN_FACTS_PATH) else CampaignFactStore()
         print("🤖 AI Analytics Engine initialized")
     
+    def _fit_forecast(self, y):
+        """Fit (or warm-start from a cached prefix) a forest for series `y`; returns (model, warm_started)"""
+        X = np.arange(len(y), dtype=np.float64).reshape(-1, 1)
+        for appended in range(1, min(FORECAST_WARM_START_POINTS, len(y) - 3) + 1):
+            base = self.forecasts.peek(history_key(y[:-appended]))
+            if base is None or base['model'].n_estimators + FORECAST_WARM_START_TREES > FORECAST_MAX_TREES:
+                continue
+            model = copy.deepcopy(base['model'])
+            model.set_params(n_estimators=model.n_estimators + FORECAST_WARM_START_TREES)
+            model.fit(X, y)
+            return model, True
+        model = RandomForestRegressor(n_estimators=FORECAST_TREES, random_state=42, warm_start=True)
+        model.fit(X, y)
+        return model, False
+    
     def predict_conversions(self, historical_data):
         """Predict future conversions using ML"""
         if len(historical_data) < 3:
             return None
         
-        X = np.array([[i] for i in range(len(historical_data))])
-        y = np.array(historical_data)
-        
-        self.model.fit(X, y)
-        
-        # Predict next 7 days
-        future_X = np.array([[len(historical_data) + i] for i in range(7)])
-        predictions = self.model.predict(future_X)
+        y = np.asarray(historical_data, dtype=np.float64)
+        key = history_key(y)
+        entry = self.forecasts.get(key)
+        if entry is None:
+            model, warm_started = self._fit_forecast(y)
+            # Predict next 7 days
+            future_X = np.arange(len(y), len(y) + FORECAST_HORIZON, dtype=np.float64).reshape(-1, 1)
+            entry = {'model': model, 'predictions': model.predict(future_X).tolist()}
+            self.forecasts.put(key, entry, warm_started)
         
+        predictions = entry['predictions']
         return {
-            'predictions': predictions.tolist(),
+            'predictions': list(predictions),
             'confidence': 0.85,
             'trend': 'increasing' if predictions[-1] > predictions[0] else 'decreasing'
         }
     
-    def analyze_sentiment_trends(self, comments):
-        """Analyze sentiment patterns over time"""
-        sentiments = {'positive': 0, 'negative': 0, 'neutral': 0}
-        
-        for comment in comments:
-            sentiment = comment.get('sentiment', 'neutral')
-            sentiments[sentiment] += 1
-        
-        total = sum(sentiments.values())
-        if total == 0:
-            return None
+    def predict_conversions_batch(self, histories, horizon=FORECAST_HORIZON, method='linear'):
+        """Forecast many series at once from a (campaign x day) array
+
+        'linear' fits trend + day-of-week regression for every row in one
+        batched least-squares solve. Rows may be left-padded with NaN when
+        histories have different lengths. 'forest' runs predict_conversions
+        per row (slow path, uses the model cache).
+        """
+        Y = np.atleast_2d(np.asarray(histories, dtype=np.float64))
+        n_series, n_days = Y.shape
+        if method == 'forest':
+            predictions = np.full((n_series, horizon), np.nan)
+            for i, row in enumerate(Y):
+                result = self.predict_conversions(row[~np.isnan(row)].tolist())
+                if result is not None:
+                    predictions[i] = result['predictions'][:horizon]
+            confidence = np.full(n_series, 0.85)
+        elif method == 'linear':
+            predictions, confidence = self._linear_forecast(Y, horizon)
+        else:
+            raise ValueError(f"Unknown forecast method '{method}', expected 'linear' or 'forest'")
         
+        # Same JSON-ready types as predict_conversions; rows the forest could not fit are None
+        failed = np.isnan(predictions).all(axis=1)
+        trend = np.where(predictions[:, -1] > predictions[:, 0], 'increasing', 'decreasing')
         return {
-            'sentiment_distribution': {
-                k: round(v/total * 100, 2) for k, v in sentiments.items()
-            },
-            'dominant_sentiment': max(sentiments, key=sentiments.get),
-            'sentiment_score': (sentiments['positive'] - sentiments['negative']) / total
+            'predictions': [None if bad else row for row, bad in zip(predictions.tolist(), failed)],
+            'confidence': [None if bad else c for c, bad in zip(confidence.tolist(), failed)],
+            'trend': [None if bad else str(tr) for tr, bad in zip(trend, failed)],
+            'method': method
         }
     
-    def calculate_roi(self, campaign_data):
-        """Calculate ROI and key metrics"""
-        total_spent = sum(c.get('ad_spend', 0) for c in campaign_data.values())
-        total_revenue = sum(c.get('revenue_estimate', 0) for c in campaign_data.values())
+    def _linear_forecast(self, Y, horizon):
+        n_series, n_days = Y.shape
+        # Shared design matrix: intercept, day index, day-of-season dummies (first day is the baseline).
+        # The dummies need at least two full seasons of history; shorter series get trend only
+        t = np.arange(n_days + horizon, dtype=np.float64)
+        season = FORECAST_SEASON if n_days >= 2 * FORECAST_SEASON else 1
+        design = np.column_stack([np.ones_like(t), t / max(n_days, 1)] +
+                                 [(t % season == k).astype(np.float64) for k in range(1, season)])
+        X, X_future = design[:n_days], design[n_days:]
         
-        roi = ((total_revenue - total_spent) / total_spent * 100) if total_spent > 0 else 0
+        mask = ~np.isnan(Y)
+        Y0 = np.where(mask, Y, 0.0)
+        W = mask.astype(np.float64)
+        n_params = X.shape[1]
+        ridge = FORECAST_RIDGE * np.eye(n_params)
+        if mask.all():
+            # Same design for every row: one solve shared by all series
+            beta = np.linalg.solve(X.T @ X + ridge, X.T @ Y0.T).T
+        else:
+            # Per-series normal equations (X' W X) b = X' W y, built with two matmuls and solved as one batch
+            outer = (X[:, :, None] * X[:, None, :]).reshape(n_days, -1)
+            XtWX = (W @ outer).reshape(n_series, n_params, n_params) + ridge
+            beta = np.linalg.solve(XtWX, ((Y0 * W) @ X)[..., None])[..., 0]
         
+        predictions = beta @ X_future.T
+        fitted = beta @ X.T
+        counts = np.maximum(W.sum(axis=1), 1)
+        means = Y0.sum(axis=1) / counts
+        ss_res = (((Y0 - fitted) * W) ** 2).sum(axis=1)
+        ss_tot = (((Y0 - means[:, None]) * W) ** 2).sum(axis=1)
+        confidence = np.clip(1 - ss_res / np.where(ss_tot > 0, ss_tot, 1), 0, 1)
+        # Too little history to estimate anything: carry the last value forward
+        short = counts < 3
+        if short.any():
+            last = np.array([row[m][-1] if m.any() else 0.0 for row, m in zip(Y[short], mask[short])])
+            predictions[short] = last[:, None]
+            confidence[short] = 0.0
+        return predictions, confidence
+    
+    def predict_campaigns(self, metric='conversions', days=90, method='linear'):
+        """7-day forecasts for every campaign in the fact store, keyed by campaign"""
+        names, histories = self.facts.series_matrix(metric, days)
+        if not names:
+            return {}
+        result = self.predict_conversions_batch(histories, method=method)
         return {
-            'roi': round(roi, 2),
-            'total_revenue': total_revenue,
-            'total_spent': total_spent,
-            'profit': total_revenue - total_spent,
-            'roas': round(total_revenue / total_spent, 2) if total_spent > 0 else 0
+            name: {
+                'predictions': result['predictions'][i],
+                'confidence': round(result['confidence'][i], 2),
+                'trend': result['trend'][i]
+            }
+            for i, name in enumerate(names)
+            if result['predictions'][i] is not None
         }
     
+    def label_comments(self, comments):
+        """Fill in 'sentiment' for comments that only have text, using the local classifier"""
+        if all(c.get('sentiment') or not c.get('text') for c in comments):
+            return comments
+        return get_classifier().label_comments(comments)
+    
+    def analyze_sentiment_trends(self, comments):
+        """Analyze sentiment patterns over time (unknown labels count as neutral)"""
+        comments = self.label_comments(comments)
+        codes = label_codes([comment.get('sentiment', 'neutral') for comment in comments])
+        return summarise(np.bincount(codes, minlength=len(SENTIMENT_LABELS)))
+    
+    def calculate_roi(self, campaign_data=None, days=None):
+        """Calculate ROI and key metrics (from the running aggregates unless given campaign data or a day window)"""
+        if days is not None:
+            totals = self.facts.overall(days)
+            return roi_metrics(_number(totals['ad_spend']), _number(totals['revenue_estimate']))
+        if campaign_data is None:
+            return self.aggregates.roi()
+        total_spent = sum(c.get('ad_spend', 0) for c in campaign_data.values())
+        total_revenue = sum(c.get('revenue_estimate', 0) for c in campaign_data.values())
+        return roi_metrics(total_spent, total_revenue)
+    
     def detect_anomalies(self, metrics_history):
         """Detect unusual patterns in campaign performance"""
         if len(metrics_history) < 5:
             return []
         
-        values = np.array(metrics_history)
-        mean = np.mean(values)
-        std = np.std(values)
-        
-        anomalies = []
-        for i, val in enumerate(values):
-            z_score = abs((val - mean) / std) if std > 0 else 0
-            if z_score > 2:
-                anomalies.append({
-                    'index': i,
-                    'value': float(val),
-                    'severity': 'high' if z_score > 3 else 'medium',
-                    'type': 'spike' if val > mean else 'drop'
-                })
-        
-        return anomalies
+        values = np.asarray(metrics_history, dtype=np.float64)
+        z_scores = StreamingAnomalyDetector.zscores(values)
+        return anomaly_records(values, z_scores, np.full_like(values, values.mean()))
     
     def generate_insights(self, data):
         """Generate AI-powered insights with actionable links"""
@@ -99,7 +519,19 @@ class AIAnalyticsEngine:
         
         # Analyze campaign performance
         campaigns = data.get('campaign_tracking', {})
-        if campaigns:
+        if len(self.facts):
+            # Recent performance from daily history rather than all-time totals
+            top = self.facts.top_n('conversions', 1, days=7)
+            insights.append({
+                'type': 'performance',
+                'title': f'Top Performer: {top.index[0]}',
+                'description': f'Generated {_number(top.iloc[0])} conversions in the last 7 days',
+                'action': 'Increase budget allocation',
+                'priority': 'high',
+                'link': '/campaigns.html',
+                'campaign_id': str(top.index[0])
+            })
+        elif campaigns:
             best_campaign = max(campaigns.items(), 
                               key=lambda x: x[1].get('conversions', 0))
             insights.append({
@@ -128,32 +560,52 @@ class AIAnalyticsEngine:
         
         return insights
     
-    def optimize_posting_schedule(self, engagement_data):
-        """Recommend optimal posting times"""
-        best_hours = [9, 12, 18, 20]
-        best_days = ['Monday', 'Wednesday', 'Friday']
-        
-        return {
-            'best_hours': best_hours,
-            'best_days': best_days,
-            'timezone': 'PST',
-            'expected_boost': '+35% engagement'
-        }
+    def record_engagement(self, events):
+        """Add engagement events (timestamp + views/likes/comments/shares) to the running schedule histograms"""
+        self.schedule.add(events)
+    
+    def optimize_posting_schedule(self, engagement_data=None, metric='engagement'):
+        """Recommend optimal posting times from engagement events
+
+        With `engagement_data` the histograms are built from those events;
+        otherwise the running ones from record_engagement() are used, and the
+        recommendation is served from cache until new events arrive.
+        """
+        schedule = PostingSchedule.from_events(engagement_data) if engagement_data else self.schedule
+        recommendation = schedule.recommend(metric)
+        if recommendation is None:
+            return dict(DEFAULT_SCHEDULE)
+        return recommendation
 
 
+    def record_facts(self, campaign_data):
+        """Fold a campaign_tracking snapshot into today's daily facts and persist the store"""
+        if not campaign_data:
+            return
+        self.facts.add_campaign_tracking(campaign_data)
+        try:
+            self.facts.save(CAMPAIGN_FACTS_PATH)
+        except OSError as e:
+            # Read-only deployments (e.g. Vercel) keep the history in memory only
+            print(f"⚠️ Could not save campaign facts: {e}")
+
     def analyze(self, query):
         """Main analyze method for AI analytics queries"""
         query_lower = query.lower()
         
         try:
-            with open('data.json', 'r') as f:
-                data = json.load(f)
-            campaign_data = data.get('campaign_tracking', {})
-        except:
-            campaign_data = {}
+            snapshot = get_store().snapshot()
+            campaign_data, version = snapshot.data.get('campaign_tracking', {}), snapshot.version
+        except (OSError, ValueError):
+            campaign_data, version = {}, None
+        # Aggregates and daily facts only need resyncing when data.json actually changed
+        if version != self._aggregates_version:
+            self.aggregates.sync(campaign_data)
+            self._aggregates_version = version
+            self.record_facts(campaign_data)
         
         if 'campaign' in query_lower or 'performance' in query_lower:
-            roi_data = self.calculate_roi(campaign_data)
+            roi_data = self.calculate_roi()
             return {
                 "query": query,
                 "analysis": f"Campaign Performance: ROI is {roi_data['roi']}%. Revenue: ${roi_data['total_revenue']:,}. Profit: ${roi_data['profit']:,}.",
@@ -161,7 +613,7 @@ class AIAnalyticsEngine:
                 "recommendations": ["Focus on high-performing campaigns", "Optimize ad spend"]
             }
         else:
-            roi_data = self.calculate_roi(campaign_data)
+            roi_data = self.calculate_roi()
             return {
                 "query": query,
                 "analysis": f"Overall Performance: {roi_data['roi']}% ROI with ${roi_data['total_revenue']:,} revenue.",
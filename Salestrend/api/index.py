@@ -1,9 +1,12 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import os
-import json
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_store import get_store
+
 app = Flask(__name__)
 CORS(app)
 
@@ -83,11 +86,8 @@ def generate_video():
 @app.route('/api/campaigns')
 def campaigns():
     try:
-        # Try to read data.json
-        data_path = os.path.join(os.path.dirname(__file__), '..', 'data.json')
-        if os.path.exists(data_path):
-            with open(data_path, 'r') as f:
-                return jsonify(json.load(f))
+        return Response(get_store().raw(), mimetype='application/json')
+    except FileNotFoundError:
         return jsonify({"campaigns": [], "message": "No data available"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,170 @@
+"""
+Columnar daily campaign facts
+One row per (date, campaign) in a pandas DataFrame, persisted as Parquet/Feather
+"""
+import os
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+FACT_METRICS = ['clicks', 'conversions', 'revenue_estimate', 'ad_spend']
+FACT_COLUMNS = ['date', 'campaign'] + FACT_METRICS
+# Parquet/Feather need pyarrow; without it the store falls back to a pandas pickle
+CAMPAIGN_FACTS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'campaign_facts.parquet' if HAS_ARROW else 'campaign_facts.pkl'
+)
+
+
+def _empty_frame():
+    frame = pd.DataFrame({
+        'date': pd.Series(dtype='datetime64[ns]'),
+        'campaign': pd.Series(dtype='category'),
+    })
+    for metric in FACT_METRICS:
+        frame[metric] = pd.Series(dtype='float64')
+    return frame
+
+
+class CampaignFactStore:
+    """Daily per-campaign metrics kept column-wise for vectorised group-by / rolling / top-N queries
+
+    Rows are unique per (date, campaign); appending a day that already
+    exists replaces it. Readers get the current frame, which is swapped
+    rather than modified in place, so queries never see a half-applied append.
+    """
+
+    def __init__(self, frame=None):
+        self._frame = _empty_frame() if frame is None else self._normalise(frame)
+        self._lock = threading.Lock()
+        # Serialises saves so the file always ends up holding the newest frame
+        self._save_lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(frame):
+        frame = frame.reindex(columns=FACT_COLUMNS)
+        frame['date'] = pd.to_datetime(frame['date']).dt.normalize()
+        frame['campaign'] = frame['campaign'].astype(str).astype('category')
+        frame[FACT_METRICS] = frame[FACT_METRICS].astype('float64').fillna(0.0)
+        return frame.sort_values(['date', 'campaign'], kind='stable').reset_index(drop=True)
+
+    @property
+    def frame(self):
+        return self._frame
+
+    def __len__(self):
+        return len(self._frame)
+
+    @property
+    def campaigns(self):
+        return list(self._frame['campaign'].cat.categories)
+
+    def append(self, rows):
+        """Add daily rows (DataFrame or list of dicts with date, campaign and metric columns)"""
+        new = self._normalise(pd.DataFrame(rows))
+        with self._lock:
+            combined = pd.concat([self._frame.astype({'campaign': str}), new.astype({'campaign': str})], ignore_index=True)
+            combined = combined.drop_duplicates(['date', 'campaign'], keep='last')
+            self._frame = self._normalise(combined)
+
+    def add_campaign_tracking(self, campaign_tracking, date=None):
+        """Record a data.json campaign_tracking snapshot as the day's activity
+
+        campaign_tracking holds running totals, so the day's row is the
+        snapshot minus everything recorded before that day. Ingesting again
+        on the same day replaces the row instead of adding to it, and the
+        stored rows always sum to the latest snapshot. A total that went down
+        (a reset or correction) records no activity.
+        """
+        if not campaign_tracking:
+            return
+        date = pd.Timestamp(date if date is not None else pd.Timestamp.now()).normalize()
+        current = pd.DataFrame.from_dict({str(name): dict(record) for name, record in campaign_tracking.items()}, orient='index')
+        current = current.reindex(columns=FACT_METRICS).apply(pd.to_numeric, errors='coerce').fillna(0.0)
+        frame = self._frame
+        recorded = frame[frame['date'] < date].groupby('campaign', observed=True)[FACT_METRICS].sum()
+        recorded.index = recorded.index.astype(str)
+        deltas = (current - recorded.reindex(current.index).fillna(0.0)).clip(lower=0.0)
+        self.append(deltas.rename_axis('campaign').reset_index().assign(date=date))
+
+    def _window(self, days=None, end=None):
+        frame = self._frame
+        if days is None or frame.empty:
+            return frame
+        end = pd.Timestamp(end).normalize() if end is not None else frame['date'].max()
+        return frame[(frame['date'] > end - pd.Timedelta(days=days)) & (frame['date'] <= end)]
+
+    def totals(self, days=None, end=None):
+        """Per-campaign metric sums over the last `days` days (all history if None)"""
+        return self._window(days, end).groupby('campaign', observed=True)[FACT_METRICS].sum()
+
+    def overall(self, days=None, end=None):
+        return self._window(days, end)[FACT_METRICS].sum()
+
+    def top_n(self, metric, n=5, days=None, end=None):
+        """Campaigns with the largest `metric` total in the window"""
+        return self.totals(days, end)[metric].nlargest(n)
+
+    def rolling(self, metric, window=7):
+        """Trailing `window`-day sum of `metric` per campaign (dates x campaigns, missing days count as 0)"""
+        return self.daily(metric).rolling(window, min_periods=1).sum()
+
+    def daily(self, metric):
+        """Dates x campaigns table of `metric`, with every calendar day present (missing days are 0)"""
+        frame = self._frame
+        if frame.empty:
+            return pd.DataFrame()
+        table = frame.pivot_table(index='date', columns='campaign', values=metric, aggfunc='sum', observed=True)
+        days = pd.date_range(table.index.min(), table.index.max(), freq='D')
+        return table.reindex(days).fillna(0.0)
+
+    def series_matrix(self, metric, days=None):
+        """(campaigns, campaign x day array) for predict_conversions_batch
+
+        Days before a campaign's first row are NaN so short histories are left-padded.
+        """
+        table = self.daily(metric)
+        if table.empty:
+            return [], np.empty((0, 0))
+        first_seen = self._frame.groupby('campaign', observed=True)['date'].min().reindex(table.columns)
+        values = table.to_numpy().T.copy()
+        values[table.index.to_numpy()[None, :] < first_seen.to_numpy()[:, None]] = np.nan
+        if days is not None:
+            values = values[:, -days:]
+        return list(table.columns.astype(str)), values
+
+    def save(self, path=CAMPAIGN_FACTS_PATH):
+        with self._save_lock:
+            frame = self._frame.astype({'campaign': str})
+            # Write to a unique file beside the target and swap it in, so neither a concurrent
+            # load nor another process's save ever sees a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+            os.close(fd)
+            try:
+                if path.endswith('.parquet'):
+                    frame.to_parquet(tmp_path, index=False)
+                elif path.endswith('.feather'):
+                    frame.to_feather(tmp_path)
+                else:
+                    frame.to_pickle(tmp_path, compression=None)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+    @classmethod
+    def load(cls, path=CAMPAIGN_FACTS_PATH):
+        if path.endswith('.parquet'):
+            frame = pd.read_parquet(path)
+        elif path.endswith('.feather'):
+            frame = pd.read_feather(path)
+        else:
+            frame = pd.read_pickle(path)
+        return cls(frame)
@@ -0,0 +1,107 @@
+"""
+Shared in-memory copy of data.json
+Parsed once and revalidated with a stat() per access; handlers get read-only views
+"""
+import json
+import os
+import threading
+from types import MappingProxyType
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.json')
+
+
+def freeze(value):
+    """Read-only view of parsed JSON: dicts become mapping proxies, lists become tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class Snapshot:
+    """One parsed version of the file: `raw` bytes for passthrough responses, frozen `data` for analytics"""
+    __slots__ = ('version', 'raw', 'data')
+
+    def __init__(self, version, raw, data):
+        self.version = version
+        self.raw = raw
+        self.data = data
+
+
+class DataStore:
+    """Thread-safe cache of a JSON file, reloaded when its mtime or size changes
+
+    A reload parses into a new Snapshot and swaps it in with a single
+    assignment, so readers see either the old or the new file, never a mix.
+    If the file is mid-write (invalid JSON) the previous snapshot keeps being
+    served and the next access tries again.
+    """
+
+    def __init__(self, path=DATA_PATH):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_errors = 0
+
+    def _version(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self):
+        """Current Snapshot; raises OSError / ValueError only if no version was ever loaded"""
+        try:
+            version = self._version()
+        except OSError:
+            if self._snapshot is None:
+                raise
+            return self._snapshot
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            # Another thread may have reloaded while we waited
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+                data = freeze(json.loads(raw))
+            except (OSError, ValueError):
+                self.load_errors += 1
+                if self._snapshot is None:
+                    raise
+                return self._snapshot
+            self._snapshot = Snapshot(version, raw, data)
+            self.loads += 1
+            return self._snapshot
+
+    def data(self):
+        return self.snapshot().data
+
+    def raw(self):
+        return self.snapshot().raw
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'path': self.path,
+            'loaded': snapshot is not None,
+            'loads': self.loads,
+            'load_errors': self.load_errors,
+            'bytes': len(snapshot.raw) if snapshot else 0
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=DATA_PATH):
+    """Process-wide DataStore for `path`"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = DataStore(path)
+        return _stores[path]
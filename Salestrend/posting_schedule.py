@@ -0,0 +1,142 @@
+"""
+Posting-schedule recommendations from engagement events
+Hour-of-week histograms per metric, updated incrementally; recommendations cached until new events land
+"""
+import copy
+import threading
+import numpy as np
+import pandas as pd
+
+ENGAGEMENT_METRICS = ('views', 'likes', 'comments', 'shares')
+# 'engagement' scores a post by its interactions, not reach
+ENGAGEMENT_WEIGHTS = {'views': 0.0, 'likes': 1.0, 'comments': 1.0, 'shares': 1.0}
+SCHEDULE_TIMEZONE = 'America/Los_Angeles'
+SLOTS_PER_WEEK = 7 * 24
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+# Slot means are shrunk towards the overall mean as if each slot had this many extra average posts
+PRIOR_EVENTS = 5
+DEFAULT_SCHEDULE = {
+    'best_hours': [9, 12, 18, 20],
+    'best_days': ['Monday', 'Wednesday', 'Friday'],
+    'timezone': 'PST',
+    'expected_boost': '+35% engagement'
+}
+
+
+class PostingSchedule:
+    """Sum and count of each engagement metric per hour-of-week slot (Monday 00:00 = slot 0)"""
+
+    def __init__(self, timezone=SCHEDULE_TIMEZONE):
+        self.timezone = timezone
+        self.sums = np.zeros((SLOTS_PER_WEEK, len(ENGAGEMENT_METRICS)))
+        self.counts = np.zeros(SLOTS_PER_WEEK, dtype=np.int64)
+        self.version = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_events(cls, events, timezone=SCHEDULE_TIMEZONE):
+        schedule = cls(timezone)
+        schedule.add(events)
+        return schedule
+
+    @property
+    def events(self):
+        return int(self.counts.sum())
+
+    def _slots(self, timestamps):
+        """Hour-of-week slot per timestamp (ISO strings, datetimes or epoch seconds); -1 if unparseable"""
+        timestamps = pd.Series(timestamps)
+        if timestamps.dtype.kind in 'iuf':
+            parsed = pd.to_datetime(timestamps, unit='s', utc=True, errors='coerce')
+        else:
+            try:
+                parsed = pd.to_datetime(timestamps, utc=True, format='ISO8601')
+            except (ValueError, TypeError):
+                parsed = pd.to_datetime(timestamps, utc=True, errors='coerce', format='mixed')
+        local = parsed.dt.tz_convert(self.timezone)
+        slots = (local.dt.dayofweek * 24 + local.dt.hour).to_numpy(dtype=np.float64, na_value=-1)
+        return slots.astype(np.int64)
+
+    def add(self, events):
+        """Ingest engagement events: dicts (or a DataFrame) with a 'timestamp' and any of ENGAGEMENT_METRICS"""
+        frame = events if isinstance(events, pd.DataFrame) else pd.DataFrame(list(events))
+        if frame.empty or 'timestamp' not in frame:
+            return
+        values = frame.reindex(columns=list(ENGAGEMENT_METRICS)).apply(pd.to_numeric, errors='coerce').fillna(0.0)
+        self.add_arrays(frame['timestamp'], values.to_numpy(dtype=np.float64))
+
+    def add_arrays(self, timestamps, values):
+        """Ingest parallel arrays: timestamps and an (n x len(ENGAGEMENT_METRICS)) value matrix"""
+        slots = self._slots(timestamps)
+        values = np.asarray(values, dtype=np.float64).reshape(len(slots), len(ENGAGEMENT_METRICS))
+        valid = slots >= 0
+        slots, values = slots[valid], values[valid]
+        if not len(slots):
+            return
+        counts = np.bincount(slots, minlength=SLOTS_PER_WEEK)
+        sums = np.column_stack([
+            np.bincount(slots, weights=values[:, m], minlength=SLOTS_PER_WEEK) for m in range(len(ENGAGEMENT_METRICS))
+        ])
+        with self._lock:
+            self.counts += counts
+            self.sums += sums
+            self.version += 1
+            self._cache.clear()
+
+    def _metric_totals(self, metric):
+        if metric == 'engagement':
+            weights = np.array([ENGAGEMENT_WEIGHTS[m] for m in ENGAGEMENT_METRICS])
+        elif metric in ENGAGEMENT_METRICS:
+            weights = np.array([float(m == metric) for m in ENGAGEMENT_METRICS])
+        else:
+            raise ValueError(f"Unknown metric '{metric}', expected 'engagement' or one of {ENGAGEMENT_METRICS}")
+        return self.sums @ weights
+
+    @staticmethod
+    def _uplift(totals, counts, overall_mean):
+        """Shrunk per-bin mean relative to the overall mean (0.2 = 20% above average)"""
+        shrunk = (totals + PRIOR_EVENTS * overall_mean) / (counts + PRIOR_EVENTS)
+        return shrunk / overall_mean - 1 if overall_mean > 0 else np.zeros_like(shrunk)
+
+    def recommend(self, metric='engagement', top_n=5, n_hours=4, n_days=3):
+        """Best hour-of-week slots, hours and days by average `metric` per event, with uplift estimates"""
+        key = (metric, top_n, n_hours, n_days)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+            totals, counts, version = self._metric_totals(metric), self.counts.copy(), self.version
+        if not counts.sum():
+            return None
+        overall_mean = totals.sum() / counts.sum()
+
+        slot_uplift = self._uplift(totals, counts, overall_mean)
+        # Only slots that beat the average are worth recommending
+        ranked = [int(s) for s in np.argsort(-slot_uplift, kind='stable') if counts[s] > 0 and slot_uplift[s] > 0][:top_n]
+        by_hour = self._uplift(totals.reshape(7, 24).sum(axis=0), counts.reshape(7, 24).sum(axis=0), overall_mean)
+        by_day = self._uplift(totals.reshape(7, 24).sum(axis=1), counts.reshape(7, 24).sum(axis=1), overall_mean)
+        hour_counts, day_counts = counts.reshape(7, 24).sum(axis=0), counts.reshape(7, 24).sum(axis=1)
+        best_hours = [int(h) for h in np.argsort(-by_hour, kind='stable') if hour_counts[h] > 0][:n_hours]
+        best_days = [int(d) for d in np.argsort(-by_day, kind='stable') if day_counts[d] > 0][:n_days]
+        boost = float(np.mean(slot_uplift[ranked])) * 100 if ranked else 0.0
+
+        result = {
+            'best_hours': best_hours,
+            'best_days': [DAY_NAMES[d] for d in best_days],
+            'timezone': self.timezone,
+            'expected_boost': f'{boost:+.0f}% {metric}',
+            'top_slots': [{
+                'day': DAY_NAMES[s // 24],
+                'hour': s % 24,
+                'uplift': round(float(slot_uplift[s]), 3),
+                'events': int(counts[s])
+            } for s in ranked],
+            'metric': metric,
+            'events': int(counts.sum())
+        }
+        with self._lock:
+            # Don't cache a result computed from data that has since changed
+            if self.version == version:
+                self._cache[key] = copy.deepcopy(result)
+        return result
@@ -0,0 +1,191 @@
+"""
+Local batch sentiment classifier
+Hashing vectorisers + linear model; only the weights ship, as models/sentiment_linear.npz
+
+Retrain after editing models/sentiment_seed.json:
+    python sentiment_classifier.py
+"""
+import json
+import os
+import threading
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+MODEL_PATH = os.path.join(MODELS_DIR, 'sentiment_linear.npz')
+SEED_PATH = os.path.join(MODELS_DIR, 'sentiment_seed.json')
+N_FEATURES = 2 ** 18
+BATCH_SIZE = 20000
+
+
+def make_vectorizers():
+    """Stateless featurisers, each hashed into N_FEATURES columns
+
+    Word unigrams + bigrams catch phrases ("not good"); character 3-4-grams
+    within words carry over to inflections and typos never seen in training.
+    """
+    return (
+        HashingVectorizer(
+            n_features=N_FEATURES,
+            ngram_range=(1, 2),
+            token_pattern=r"(?u)\b\w+\b",
+            alternate_sign=False,
+            norm='l2',
+            dtype=np.float32
+        ),
+        HashingVectorizer(
+            n_features=N_FEATURES,
+            analyzer='char_wb',
+            ngram_range=(3, 4),
+            alternate_sign=False,
+            norm='l2',
+            dtype=np.float32
+        ),
+    )
+
+
+def featurise(texts, vectorizers=None):
+    """CSR matrix of len(texts) x (N_FEATURES * number of vectorisers)"""
+    texts = list(texts)
+    return sparse.hstack([v.transform(texts) for v in vectorizers or make_vectorizers()], format='csr')
+
+
+class SentimentClassifier:
+    """Linear sentiment model over hashed n-grams; a batch is one sparse-dense matmul"""
+
+    def __init__(self, weights, intercept, labels):
+        # Dense (n_features x n_classes) so X @ weights stays a CSR-times-dense product
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.labels = np.asarray(labels)
+        self.vectorizers = make_vectorizers()
+
+    def decision_function(self, texts):
+        X = featurise(texts, self.vectorizers)
+        return X @ self.weights + self.intercept
+
+    def predict(self, texts):
+        """Label for each text ('positive' / 'negative' / 'neutral')"""
+        texts = list(texts)
+        labels = []
+        for start in range(0, len(texts), BATCH_SIZE):
+            scores = self.decision_function(texts[start:start + BATCH_SIZE])
+            labels.extend(self.labels[np.argmax(scores, axis=1)].tolist())
+        return labels
+
+    def predict_proba(self, texts):
+        scores = self.decision_function(list(texts))
+        scores -= scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def label_comments(self, comments):
+        """Copies of `comments` with 'sentiment' filled in wherever it is missing and there is text"""
+        comments = [dict(comment) for comment in comments]
+        unlabelled = [c for c in comments if not c.get('sentiment') and c.get('text')]
+        for comment, label in zip(unlabelled, self.predict(c['text'] for c in unlabelled)):
+            comment['sentiment'] = label
+        return comments
+
+    def save(self, path=MODEL_PATH):
+        weights = sparse.csc_matrix(self.weights)
+        np.savez_compressed(
+            path,
+            data=weights.data, indices=weights.indices, indptr=weights.indptr, shape=weights.shape,
+            intercept=self.intercept, labels=self.labels
+        )
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path, allow_pickle=False) as f:
+            weights = sparse.csc_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+            return cls(weights.toarray(), f['intercept'], f['labels'])
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_classifier():
+    """Shared classifier loaded from MODEL_PATH on first use"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SentimentClassifier.load()
+        return _default
+
+
+def seed_examples(seed_path=SEED_PATH, data_path=None):
+    """(texts, labels, groups) from the seed templates, lexicon and labelled comments, plus any in data.json
+
+    Every expansion of one template shares a group, so a held-out split by
+    group measures how well the model handles phrasings it never saw.
+    """
+    with open(seed_path) as f:
+        seed = json.load(f)
+    texts, labels, groups = [], [], []
+
+    def add(text, label, group):
+        texts.append(text)
+        labels.append(label)
+        groups.append(group)
+
+    for label, templates in seed['templates'].items():
+        for template in templates:
+            for subject in seed['subjects']:
+                add(template.format(s=subject), label, f'template:{template}')
+    for label, words in seed['lexicon'].items():
+        for word in words:
+            add(word, label, f'word:{word}')
+    for label, comments in seed.get('comments', {}).items():
+        for comment in comments:
+            add(comment, label, f'comment:{comment}')
+    if data_path and os.path.exists(data_path):
+        with open(data_path) as f:
+            for comment in json.load(f).get('sentiment_analysis', []):
+                if comment.get('text') and comment.get('sentiment'):
+                    add(comment['text'], comment['sentiment'], f"comment:{comment['text']}")
+    return texts, labels, groups
+
+
+def train(texts, labels, groups=None, C=10.0):
+    """Fit the linear model; with `groups`, each group carries the same total weight
+
+    A template expands to one example per subject, so without group weights
+    the templates would swamp the hand-labelled comments.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    X = featurise(texts)
+    sample_weight = None
+    if groups is not None:
+        _, inverse, sizes = np.unique(np.asarray(groups, dtype=object), return_inverse=True, return_counts=True)
+        sample_weight = 1.0 / sizes[inverse]
+        sample_weight *= len(sample_weight) / sample_weight.sum()
+    model = LogisticRegression(C=C, max_iter=3000)
+    model.fit(X, labels, sample_weight=sample_weight)
+    weights = model.coef_.T
+    # Features never seen in training have exactly zero weight; keep the artifact sparse
+    weights[np.abs(weights) < 1e-4] = 0
+    return SentimentClassifier(weights, model.intercept_, model.classes_)
+
+
+if __name__ == '__main__':
+    from sklearn.model_selection import GroupShuffleSplit
+
+    texts, labels, groups = seed_examples(data_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.json'))
+    texts, labels, groups = np.array(texts, dtype=object), np.array(labels), np.array(groups, dtype=object)
+    # Hold out whole templates (every subject they expand to), so scores reflect unseen phrasings
+    train_idx, test_idx = next(GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42).split(texts, labels, groups))
+    holdout = train(texts[train_idx].tolist(), labels[train_idx].tolist(), groups[train_idx])
+    correct = np.array(holdout.predict(texts[test_idx].tolist())) == labels[test_idx]
+    for kind in ('template', 'comment'):
+        rows = np.array([group.startswith(kind) for group in groups[test_idx]], dtype=bool)
+        if rows.any():
+            print(f"📊 Held-out {kind} accuracy: {correct[rows].mean():.3f} on {rows.sum()} examples")
+
+    classifier = train(texts.tolist(), labels.tolist(), groups)
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    classifier.save()
+    print(f"✅ Saved {MODEL_PATH} ({os.path.getsize(MODEL_PATH) / 1024:.1f} KB)")
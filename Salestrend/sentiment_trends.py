@@ -0,0 +1,153 @@
+"""
+Time-windowed sentiment aggregation over comment streams
+Labels and timestamps are held in NumPy columns; distributions come from bincount
+"""
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+SENTIMENT_LABELS = ('positive', 'negative', 'neutral')
+LABEL_CODES = {label: code for code, label in enumerate(SENTIMENT_LABELS)}
+LABEL_ALIASES = {'pos': 'positive', 'neg': 'negative', 'neu': 'neutral', 'mixed': 'neutral'}
+# Window sizes (seconds) whose per-window counts are kept up to date on every ingest
+TRACKED_WINDOWS = (3600, 86400)
+EPOCH = pd.Timestamp(0, tz='UTC')
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+
+def label_codes(labels):
+    """Map label strings to codes; anything unrecognised (or missing) counts as neutral"""
+    # Hash-factorise first so only the distinct labels go through the Python-level normalisation
+    inverse, unique = pd.factorize(np.asarray(labels, dtype=object))
+    normalised = (str(u).strip().lower() for u in unique)
+    # Trailing neutral entry: factorize gives missing values the code -1
+    lookup = np.array([LABEL_CODES.get(LABEL_ALIASES.get(u, u), LABEL_CODES['neutral']) for u in normalised]
+                      + [LABEL_CODES['neutral']], dtype=np.int8)
+    return lookup[inverse]
+
+
+def epoch_seconds(timestamps):
+    """Epoch seconds for ISO strings, datetimes or epoch-second numbers; MISSING_TIMESTAMP where unparseable"""
+    values = pd.Series(timestamps, dtype=object)
+    numeric = values.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool))
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns, UTC]')
+    if numeric.any():
+        parsed[numeric] = pd.to_datetime(values[numeric].astype('float64'), unit='s', utc=True, errors='coerce')
+    if not numeric.all():
+        parsed[~numeric] = pd.to_datetime(values[~numeric], utc=True, errors='coerce', format='mixed')
+    # Whole seconds since the epoch whatever unit pandas parsed into
+    seconds = (parsed - EPOCH) // pd.Timedelta('1s')
+    return np.array(seconds.fillna(MISSING_TIMESTAMP), dtype=np.int64)
+
+
+def summarise(counts):
+    """analyze_sentiment_trends-shaped summary of a [positive, negative, neutral] count vector"""
+    total = int(counts.sum())
+    if total == 0:
+        return None
+    return {
+        'sentiment_distribution': {
+            label: round(float(counts[code]) / total * 100, 2) for label, code in LABEL_CODES.items()
+        },
+        'dominant_sentiment': SENTIMENT_LABELS[int(np.argmax(counts))],
+        'sentiment_score': (float(counts[LABEL_CODES['positive']]) - float(counts[LABEL_CODES['negative']])) / total
+    }
+
+
+class SentimentTrends:
+    """Append-only comment sentiment columns with incremental per-window counts
+
+    `ingest` takes comment dicts (sentiment, optional timestamp); `ingest_arrays`
+    takes label codes or strings plus epoch seconds directly. Counts for
+    TRACKED_WINDOWS are updated per batch, so their trends are read without
+    touching the raw columns; other window sizes are a single bincount pass.
+    """
+
+    def __init__(self, tracked_windows=TRACKED_WINDOWS):
+        self._labels = np.zeros(1024, dtype=np.int8)
+        self._timestamps = np.zeros(1024, dtype=np.int64)
+        self._size = 0
+        self.counts = np.zeros(len(SENTIMENT_LABELS), dtype=np.int64)
+        self._windows = {window: {} for window in tracked_windows}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def ingest(self, comments):
+        """Add a batch of comment dicts ({'sentiment': ..., 'timestamp': ISO string or epoch seconds})"""
+        timestamps = [comment.get('timestamp') for comment in comments]
+        if any(ts is not None for ts in timestamps):
+            seconds = epoch_seconds(timestamps)
+            seconds[seconds == MISSING_TIMESTAMP] = int(time.time())
+        else:
+            seconds = np.full(len(comments), int(time.time()), dtype=np.int64)
+        self.ingest_arrays([comment.get('sentiment') for comment in comments], seconds)
+
+    def ingest_arrays(self, labels, timestamps):
+        labels = np.asarray(labels)
+        codes = labels.astype(np.int8) if labels.dtype.kind in 'iu' else label_codes(labels)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        n = len(codes)
+        if not n:
+            return
+        with self._lock:
+            if self._size + n > len(self._labels):
+                capacity = max(2 * len(self._labels), self._size + n)
+                self._labels = np.resize(self._labels, capacity)
+                self._timestamps = np.resize(self._timestamps, capacity)
+            self._labels[self._size:self._size + n] = codes
+            self._timestamps[self._size:self._size + n] = timestamps
+            self._size += n
+            self.counts += np.bincount(codes, minlength=len(SENTIMENT_LABELS))
+            for window, buckets in self._windows.items():
+                for bucket, counts in zip(*self._bucket_counts(codes, timestamps, window)):
+                    if bucket in buckets:
+                        buckets[bucket] += counts
+                    else:
+                        buckets[bucket] = counts
+
+    @staticmethod
+    def _bucket_counts(codes, timestamps, window):
+        """(bucket starts, [n_buckets x 3] counts) for one batch"""
+        buckets, inverse = np.unique(timestamps // window, return_inverse=True)
+        n_labels = len(SENTIMENT_LABELS)
+        counts = np.bincount(inverse * n_labels + codes, minlength=len(buckets) * n_labels).reshape(-1, n_labels)
+        return (buckets * window).tolist(), counts
+
+    def summary(self):
+        return summarise(self.counts)
+
+    def window_counts(self, window=86400, since=None):
+        """(window start epochs, counts matrix) for every non-empty window"""
+        with self._lock:
+            if window in self._windows:
+                buckets = self._windows[window]
+                starts = np.array(sorted(buckets), dtype=np.int64)
+                counts = np.array([buckets[s] for s in starts.tolist()], dtype=np.int64).reshape(-1, len(SENTIMENT_LABELS))
+            else:
+                codes, timestamps = self._labels[:self._size], self._timestamps[:self._size]
+                starts, counts = self._bucket_counts(codes, timestamps, window)
+                starts = np.array(starts, dtype=np.int64)
+        if since is not None:
+            keep = starts >= since - since % window
+            starts, counts = starts[keep], counts[keep]
+        return starts, counts
+
+    def trends(self, window=86400, since=None):
+        """Per-window distribution, score and dominant sentiment, oldest first"""
+        starts, counts = self.window_counts(window, since)
+        totals = counts.sum(axis=1)
+        if not len(totals):
+            return []
+        shares = np.round(counts / totals[:, None] * 100, 2)
+        scores = (counts[:, LABEL_CODES['positive']] - counts[:, LABEL_CODES['negative']]) / totals
+        dominant = np.argmax(counts, axis=1)
+        return [{
+            'start': pd.Timestamp(int(start), unit='s', tz='UTC').isoformat(),
+            'count': int(total),
+            'sentiment_distribution': {label: float(shares[i, code]) for label, code in LABEL_CODES.items()},
+            'dominant_sentiment': SENTIMENT_LABELS[dominant[i]],
+            'sentiment_score': float(scores[i])
+        } for i, (start, total) in enumerate(zip(starts, totals))]
@@ -2,14 +2,15 @@
 Tesla Sales Strategy Dashboard - Video Generation with Replicate API
 No GPU required - Free tier available
 """
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
 from openai import OpenAI
-import json, os, time, requests
+import os, time, requests
 from datetime import datetime
 from dotenv import load_dotenv
 import yfinance as yf
 import replicate
+from data_store import get_store
 
 # Load environment variables
 load_dotenv()
@@ -240,9 +241,8 @@ def get_tesla_stock():
 @app.route('/api/campaigns', methods=['GET'])
 def get_campaigns():
     try:
-        with open('data.json', 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
+        # Served as stored; parsed and re-read only when data.json changes
+        return Response(get_store().raw(), mimetype='application/json')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from campaign_store import CampaignFactStore  # noqa: E402
+
+
+def test_campaign_tracking_snapshots_are_stored_as_daily_deltas():
+    store = CampaignFactStore()
+    store.add_campaign_tracking({'a': {'clicks': 100, 'conversions': 5}}, date='2024-03-01')
+    store.add_campaign_tracking({'a': {'clicks': 120, 'conversions': 6}}, date='2024-03-02')
+    # A later snapshot on the same day replaces that day's row
+    store.add_campaign_tracking({'a': {'clicks': 130, 'conversions': 6}}, date='2024-03-02')
+
+    assert store.daily('clicks')['a'].tolist() == [100.0, 30.0]
+    assert store.totals().loc['a', 'clicks'] == 130.0
+    assert store.totals(days=1).loc['a', 'conversions'] == 1.0
@@ -0,0 +1,40 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentiment_trends import MISSING_TIMESTAMP, SentimentTrends, epoch_seconds  # noqa: E402
+
+# 2024-03-01T12:00:00Z
+KNOWN_EPOCH = 1709294400
+
+
+def test_epoch_seconds_round_trips_known_timestamp():
+    seconds = epoch_seconds([
+        '2024-03-01T12:00:00Z',
+        '2024-03-01T04:00:00-08:00',
+        KNOWN_EPOCH,
+        float(KNOWN_EPOCH),
+        datetime(2024, 3, 1, 12, tzinfo=timezone.utc),
+    ])
+    assert seconds.tolist() == [KNOWN_EPOCH] * 5
+
+
+def test_epoch_seconds_marks_unparseable_values():
+    seconds = epoch_seconds([None, 'not a date', KNOWN_EPOCH])
+    assert seconds.tolist() == [MISSING_TIMESTAMP, MISSING_TIMESTAMP, KNOWN_EPOCH]
+
+
+def test_ingest_buckets_by_parsed_timestamp():
+    trends = SentimentTrends()
+    trends.ingest([
+        {'sentiment': 'positive', 'timestamp': '2024-03-01T12:00:00Z'},
+        {'sentiment': 'neg', 'timestamp': KNOWN_EPOCH},
+    ])
+    starts, counts = trends.window_counts(window=3600)
+    assert starts.tolist() == [KNOWN_EPOCH]
+    assert np.array_equal(counts, [[1, 1, 0]])
+    assert trends.trends(window=86400)[0]['start'] == '2024-03-01T00:00:00+00:00'
@@ -0,0 +1,213 @@
+"""
+Admission control for LLM calls.
+
+Handlers wrap the code that actually reaches the LLM (a quiz pool miss,
+scenario generation) in `async with admission.admit():`, which applies two
+limits:
+
+- a per-client token bucket (`rate` requests/second, bursts up to `burst`),
+  answered with 429 when empty;
+- a global concurrency limit with a bounded wait queue. A request that
+  finds the queue full, or waits longer than `queue_timeout`, gets a 503.
+
+Both rejections raise AdmissionRejected, which `rejection_handler` turns
+into a response with Retry-After. Requests served from the pool, the
+scenario library or static fallbacks are never charged.
+
+AdmissionMiddleware only records who the client is. Behind a proxy, set
+ADMISSION_TRUSTED_PROXIES to the number of proxies in front of the app.
+The client is then the address the outermost trusted proxy appended to
+X-Forwarded-For. Anything left of it was supplied by the client.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "4"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+# Per-client LLM calls/second and burst. A "client" is one address: behind a proxy with
+# ADMISSION_TRUSTED_PROXIES unset, every user shares the proxy's bucket, and a classroom
+# behind one NAT always does, so these are sized for a shared address, not one learner
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "5"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "50"))
+# Proxies in front of the app that append to X-Forwarded-For (Render/Vercel: 1); 0 uses the socket peer
+ADMISSION_TRUSTED_PROXIES = int(os.getenv("ADMISSION_TRUSTED_PROXIES", "0"))
+# Buckets are kept for this many distinct clients (least recently seen are dropped)
+ADMISSION_MAX_CLIENTS = 10000
+MAX_RETRY_AFTER = 60
+
+
+_current_client = contextvars.ContextVar("admission_client", default="unknown")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status, retry_after, detail):
+        super().__init__(detail)
+        self.status = status
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class TokenBuckets:
+    """Per-client token buckets refilled lazily on each take()."""
+
+    def __init__(self, rate=ADMISSION_RATE, burst=ADMISSION_BURST, max_clients=ADMISSION_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, client):
+        """Spend one token. Returns 0 if allowed, else the seconds until a token is available."""
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return 0 if allowed else (1.0 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Global concurrency limit with a bounded, time-limited wait queue, plus per-client buckets."""
+
+    def __init__(self, max_concurrency=ADMISSION_MAX_CONCURRENCY, max_queue=ADMISSION_MAX_QUEUE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT, buckets=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.buckets = buckets if buckets is not None else TokenBuckets()
+        self._semaphore = None
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.queue_timeouts = 0
+        # Moving average of time spent in the app, used to estimate Retry-After
+        self.service_seconds = 1.0
+
+    @property
+    def enabled(self):
+        return self.max_concurrency > 0
+
+    def _retry_after(self):
+        backlog = (self.waiting + self.active) / max(self.max_concurrency, 1)
+        return backlog * self.service_seconds
+
+    async def acquire(self, client):
+        """Admit the request or return (status, retry_after_seconds, detail)."""
+        retry_after = self.buckets.take(client)
+        if retry_after:
+            self.rate_limited += 1
+            return 429, retry_after, "Too many requests from this client"
+        if not self.enabled:
+            self.admitted += 1
+            return None
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Counted by hand: the semaphore doesn't look locked until its waiters have been scheduled
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.queue_full += 1
+            return 503, self._retry_after(), "Server is at capacity"
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            return 503, self._retry_after(), "Server is at capacity"
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return None
+
+    @asynccontextmanager
+    async def admit(self, client=None):
+        """Hold an admission slot for the block; raises AdmissionRejected when the client or server is over limit."""
+        rejection = await self.acquire(client if client is not None else _current_client.get())
+        if rejection is not None:
+            raise AdmissionRejected(*rejection)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def release(self, elapsed):
+        if not self.enabled:
+            return
+        self.active -= 1
+        self._semaphore.release()
+        self.service_seconds += 0.2 * (elapsed - self.service_seconds)
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected_rate_limited": self.rate_limited,
+            "rejected_queue_full": self.queue_full,
+            "rejected_queue_timeout": self.queue_timeouts,
+            "avg_service_ms": round(self.service_seconds * 1000, 1),
+            "clients_tracked": len(self.buckets),
+        }
+
+
+class AdmissionMiddleware:
+    """Record the request's client id so AdmissionController.admit() can charge its bucket."""
+
+    def __init__(self, app, trusted_proxies=ADMISSION_TRUSTED_PROXIES):
+        self.app = app
+        self.trusted_proxies = trusted_proxies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _current_client.set(client_id(scope, self.trusted_proxies))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_client.reset(token)
+
+
+def client_id(scope, trusted_proxies=ADMISSION_TRUSTED_PROXIES):
+    if trusted_proxies > 0:
+        hops = []
+        for key, value in scope.get("headers", []):
+            if key == b"x-forwarded-for":
+                hops.extend(hop.strip() for hop in value.decode("latin-1").split(",") if hop.strip())
+        if hops:
+            # Each trusted proxy appends one hop; the outermost one appended the real client
+            return hops[-min(trusted_proxies, len(hops))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def rejection_handler(request, exc):
+    retry_after = min(MAX_RETRY_AFTER, max(1, math.ceil(exc.retry_after)))
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status, headers={"Retry-After": str(retry_after)})
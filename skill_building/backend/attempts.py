@@ -0,0 +1,77 @@
+"""
+Quiz attempt recording and skill-level updates.
+
+Attempts are buffered in memory (see write_behind.py) and persisted in
+batches: one transaction per flush inserts every attempt, moves each
+user's `skill_level` towards their recent results and reschedules graded
+questions in the spaced-repetition queue (see srs.py).
+"""
+from datetime import datetime
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Text, insert
+
+from db import AsyncSessionLocal, Base, get_or_create_users
+from srs import item_key_for, record_reviews
+
+# Weight of the newest graded answer in the skill_level moving average
+SKILL_LEARNING_RATE = 0.1
+DEFAULT_SKILL_LEVEL = 0.5
+# SM-2 grades for right/wrong quiz answers
+CORRECT_GRADE = 4
+INCORRECT_GRADE = 1
+
+
+class QuizAttempt(Base):
+    __tablename__ = "quiz_attempts"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    course_id = Column(Integer)
+    question_id = Column(Integer)
+    question = Column(Text)
+    response = Column(Text, nullable=False)
+    correct = Column(Boolean)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+def updated_skill(skill_level, correct):
+    """Exponential moving average of graded answers, kept in [0, 1]."""
+    target = 1.0 if correct else 0.0
+    return skill_level + SKILL_LEARNING_RATE * (target - skill_level)
+
+
+def attempt_record(username, response, course_id=None, question_id=None, question=None, correct=None):
+    return {
+        "username": username,
+        "course_id": course_id,
+        "question_id": question_id,
+        "question": question,
+        "response": response,
+        "correct": correct,
+        "created_at": datetime.utcnow(),
+    }
+
+
+async def persist_attempts(attempts):
+    """Insert a batch of attempts and apply their skill updates in one transaction."""
+    async with AsyncSessionLocal() as session, session.begin():
+        users = await get_or_create_users(session, [attempt["username"] for attempt in attempts], DEFAULT_SKILL_LEVEL)
+
+        rows = []
+        reviews = []
+        for attempt in attempts:
+            user = users[attempt["username"]]
+            if attempt["correct"] is not None:
+                user.skill_level = updated_skill(user.skill_level, attempt["correct"])
+                if attempt["question"]:
+                    reviews.append({
+                        "user_id": user.id,
+                        "item_key": item_key_for(attempt["course_id"], attempt["question"]),
+                        "grade": CORRECT_GRADE if attempt["correct"] else INCORRECT_GRADE,
+                        "course_id": attempt["course_id"],
+                        "prompt": attempt["question"],
+                        "reviewed_at": attempt["created_at"],
+                    })
+            row = {key: value for key, value in attempt.items() if key != "username"}
+            row["user_id"] = user.id
+            rows.append(row)
+        await session.execute(insert(QuizAttempt), rows)
+        await record_reviews(session, reviews)
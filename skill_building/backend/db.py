@@ -0,0 +1,100 @@
+import os
+from sqlalchemy import create_engine, event, select, Column, Integer, String, Float
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./skill_building.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Pool sizing; SQLite serialises writers anyway, so these mostly matter for Postgres
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# WAL lets readers proceed while a writer commits; NORMAL sync is safe with WAL
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+
+def async_database_url(url):
+    """Map a sync DATABASE_URL onto the matching async driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def _pool_options():
+    if IS_SQLITE:
+        if ":memory:" in DATABASE_URL:
+            return {}
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **_pool_options(),
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for request-path DB work, so queries don't tie up threadpool workers
+async_engine = create_async_engine(async_database_url(DATABASE_URL), **_pool_options())
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+async def get_session():
+    """FastAPI dependency yielding an AsyncSession."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+class Base(DeclarativeBase):
+    pass
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True)
+    skill_level = Column(Float, default=0.5)
+
+
+async def get_or_create_users(session, usernames, skill_level=0.5):
+    """Map usernames to User rows, inserting any that don't exist yet (one SELECT + one flush)."""
+    users = {
+        user.username: user
+        for user in await session.scalars(select(User).where(User.username.in_(set(usernames))))
+    }
+    for username in set(usernames) - users.keys():
+        users[username] = User(username=username, skill_level=skill_level)
+        session.add(users[username])
+    await session.flush()
+    return users
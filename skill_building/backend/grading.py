@@ -0,0 +1,71 @@
+"""
+Batched semantic grading of free-text quiz answers.
+
+All references and answers in a request are embedded in one call to the
+sentence embedding model (duplicates, e.g. a whole class answering the
+same question, are embedded once). Scoring is then a vectorised cosine
+similarity between each answer and its reference, mapped through a
+logistic calibration to a 0-1 score and a correct / partial / incorrect
+grade. No LLM call is involved.
+"""
+import os
+import numpy as np
+
+# Logistic calibration of MiniLM cosine similarity: unrelated sentences sit
+# around 0.1-0.3, paraphrases of the same fact around 0.7-0.9
+CALIBRATION_SLOPE = float(os.getenv("GRADING_CALIBRATION_SLOPE", "12.0"))
+CALIBRATION_MIDPOINT = float(os.getenv("GRADING_CALIBRATION_MIDPOINT", "0.55"))
+CORRECT_THRESHOLD = float(os.getenv("GRADING_CORRECT_THRESHOLD", "0.7"))
+PARTIAL_THRESHOLD = float(os.getenv("GRADING_PARTIAL_THRESHOLD", "0.4"))
+# An answer this close to the question itself is a restatement, not an answer
+ECHO_SIMILARITY = 0.95
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _similarities(texts, questions, references, answers, embed):
+    """(answer-reference, answer-question) cosine similarity per item, embedding each distinct text once"""
+    index = {text: i for i, text in enumerate(texts)}
+    vectors = _normalise(np.asarray(embed(texts), dtype=np.float32))
+
+    def rows(column):
+        # Missing texts map to a zero vector, which scores 0 similarity
+        ids = np.array([index.get(text, -1) for text in column])
+        picked = vectors[np.maximum(ids, 0)]
+        picked[ids < 0] = 0.0
+        return picked
+
+    question_vecs, reference_vecs, answer_vecs = rows(questions), rows(references), rows(answers)
+    return np.einsum("ij,ij->i", answer_vecs, reference_vecs), np.einsum("ij,ij->i", answer_vecs, question_vecs)
+
+
+def grade_batch(items, embed):
+    """Grade (question, reference, answer) dicts; `embed` maps a list of texts to vectors."""
+    if not items:
+        return []
+    questions = [item.get("question") or "" for item in items]
+    references = [item["reference"] for item in items]
+    answers = [item["answer"].strip() for item in items]
+
+    texts = list(dict.fromkeys(text for text in questions + references + answers if text))
+    if texts:
+        similarity, echo = _similarities(texts, questions, references, answers, embed)
+    else:
+        # Nothing to embed: every answer is missing and scores like a zero vector
+        similarity = echo = np.zeros(len(items), dtype=np.float32)
+
+    scores = 1.0 / (1.0 + np.exp(-CALIBRATION_SLOPE * (similarity - CALIBRATION_MIDPOINT)))
+    scores[echo >= ECHO_SIMILARITY] = np.minimum(scores[echo >= ECHO_SIMILARITY], PARTIAL_THRESHOLD - 1e-3)
+    grades = np.select([scores >= CORRECT_THRESHOLD, scores >= PARTIAL_THRESHOLD], ["correct", "partial"], "incorrect")
+
+    return [
+        {"score": round(float(score), 3), "similarity": round(float(sim), 3), "grade": str(grade)}
+        for score, sim, grade in zip(scores, similarity, grades)
+    ]
+
+
+def thresholds():
+    return {"correct": CORRECT_THRESHOLD, "partial": PARTIAL_THRESHOLD}
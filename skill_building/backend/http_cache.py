@@ -0,0 +1,180 @@
+"""
+HTTP caching for deterministic endpoints.
+
+HTTPCacheMiddleware adds an ETag and a per-route Cache-Control to matching
+responses and keeps them in a small server-side LRU keyed on method, path,
+query string and a hash of the request body. GET requests carrying a
+matching If-None-Match get a 304 without touching the route. A handler can
+opt a response out by setting `Cache-Control: no-store` itself.
+
+Add it before CORSMiddleware so cached entries never contain per-origin
+CORS headers.
+"""
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+_CACHEABLE_METHODS = ("GET", "POST")
+_DROP_ON_304 = (b"content-length", b"content-type", b"content-encoding")
+
+
+def _max_age(cache_control):
+    match = _MAX_AGE.search(cache_control or "")
+    return int(match.group(1)) if match else 0
+
+
+class ResponseCache:
+    """Bounded LRU of rendered responses with per-entry expiry."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires"] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, headers, body, etag, ttl):
+        if ttl <= 0:
+            return
+        self._entries[key] = {"headers": headers, "body": body, "etag": etag, "expires": time.monotonic() + ttl}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class HTTPCacheMiddleware:
+    """ETag / Cache-Control / server-side caching for the routes in `rules`.
+
+    `rules` maps a path prefix to the Cache-Control value for it; the
+    max-age also bounds how long the server keeps the response.
+    """
+
+    def __init__(self, app, rules, cache=None):
+        self.app = app
+        self.rules = sorted(rules.items(), key=lambda rule: len(rule[0]), reverse=True)
+        self.cache = cache if cache is not None else ResponseCache()
+
+    def _match(self, path):
+        for prefix, cache_control in self.rules:
+            if path.startswith(prefix):
+                return cache_control
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in _CACHEABLE_METHODS:
+            return await self.app(scope, receive, send)
+        cache_control = self._match(scope["path"])
+        if cache_control is None:
+            return await self.app(scope, receive, send)
+
+        body = await _read_body(receive) if scope["method"] == "POST" else b""
+        key = (scope["method"], scope["path"], scope["query_string"], hashlib.sha1(body).hexdigest())
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.hits += 1
+            return await self._respond(scope, send, entry["headers"], entry["body"], entry["etag"])
+
+        self.cache.misses += 1
+        status, headers, payload = await _call_buffered(self.app, scope, body, receive)
+        response_cache_control = _header(headers, b"cache-control")
+        if status != 200 or (response_cache_control and b"no-store" in response_cache_control):
+            return await _send(send, status, headers, payload)
+
+        etag = '"%s"' % hashlib.sha1(payload).hexdigest()
+        headers = [(k, v) for k, v in headers if k.lower() != b"etag"]
+        headers.append((b"etag", etag.encode()))
+        if response_cache_control is None:
+            headers.append((b"cache-control", cache_control.encode()))
+            ttl = _max_age(cache_control)
+        else:
+            ttl = _max_age(response_cache_control.decode())
+        self.cache.put(key, headers, payload, etag, ttl)
+        await self._respond(scope, send, headers, payload, etag)
+
+    async def _respond(self, scope, send, headers, payload, etag):
+        # Conditional requests only make sense for safe methods
+        if scope["method"] == "GET" and _etag_matches(_request_header(scope, b"if-none-match"), etag):
+            self.cache.not_modified += 1
+            headers = [(k, v) for k, v in headers if k.lower() not in _DROP_ON_304]
+            return await _send(send, 304, headers, b"")
+        await _send(send, 200, headers, payload)
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _call_buffered(app, scope, body, receive):
+    replayed = False
+    start = {}
+    chunks = []
+
+    async def replay_receive():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    async def capture_send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, replay_receive, capture_send)
+    return start["status"], list(start.get("headers", [])), b"".join(chunks)
+
+
+async def _send(send, status, headers, payload):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+def _header(headers, name):
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _request_header(scope, name):
+    return _header(scope.get("headers", []), name)
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.decode("latin-1").split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
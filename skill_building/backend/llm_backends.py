@@ -0,0 +1,277 @@
+"""
+Interchangeable text-generation backends.
+
+- "hf": the HF Inference API (Zephyr-7B), as used so far. Throughput is
+  whatever the shared endpoint gives us.
+- "local": a small instruction model run on CPU with transformers.
+  Concurrent prompts are collected for up to `max_wait_ms` and generated
+  together in one padded batch, so N simultaneous requests cost roughly
+  one forward pass per decoding step instead of N.
+- "stub": deterministic canned output after a fixed delay, for tests and
+  offline load runs.
+
+LLM_BACKEND selects the backend for the lightweight app and for the RAG
+pipeline (which otherwise keeps its LangChain HF chat model).
+"""
+import concurrent.futures
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "hf")
+# A model id, or an endpoint URL (e.g. the load-test stand-in in loadtest/fake_hf.py)
+HF_MODEL = os.getenv("HF_TEXT_GENERATION_MODEL", "HuggingFaceH4/zephyr-7b-beta")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+LOCAL_LLM_MAX_BATCH = int(os.getenv("LOCAL_LLM_MAX_BATCH", "8"))
+LOCAL_LLM_MAX_WAIT_MS = float(os.getenv("LOCAL_LLM_MAX_WAIT_MS", "20"))
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "50"))
+
+
+class LLMBackend:
+    """Blocking `generate(prompt, max_new_tokens, temperature) -> str` with call counters."""
+
+    name = "base"
+    source = ""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def available(self):
+        return True
+
+    def _generate(self, prompt, max_new_tokens, temperature):
+        raise NotImplementedError
+
+    def generate(self, prompt, max_new_tokens=256, temperature=0.7):
+        start = time.monotonic()
+        try:
+            return self._generate(prompt, max_new_tokens, temperature)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.total_seconds += time.monotonic() - start
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(self.total_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+        }
+
+
+class HFInferenceBackend(LLMBackend):
+    name = "hf"
+    source = "Generated using HuggingFace Zephyr-7B model"
+
+    def __init__(self, model=HF_MODEL):
+        super().__init__()
+        self.model = model
+
+    def available(self):
+        return os.getenv("HUGGINGFACEHUB_API_TOKEN") not in (None, "", "your_token_here")
+
+    def _generate(self, prompt, max_new_tokens, temperature):
+        from huggingface_hub import InferenceClient
+
+        client = InferenceClient(token=os.getenv("HUGGINGFACEHUB_API_TOKEN"))
+        response = client.text_generation(
+            prompt,
+            model=self.model,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature
+        )
+        return response.strip()
+
+
+class LocalTransformersBackend(LLMBackend):
+    """CPU transformers model behind a batching worker thread.
+
+    Callers block on a future while the worker groups queued prompts with
+    the same temperature (up to `max_batch_size`, waiting at most
+    `max_wait_ms` for company) and runs one `generate` over the batch. The
+    model loads on first use.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name=LOCAL_LLM_MODEL, max_batch_size=LOCAL_LLM_MAX_BATCH, max_wait_ms=LOCAL_LLM_MAX_WAIT_MS):
+        super().__init__()
+        self.model_name = model_name
+        self.source = f"Generated locally with {model_name}"
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.model = None
+        self.tokenizer = None
+        self._load_error = None
+        self._queue = queue.Queue()
+        self._held = deque()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.batched_prompts = 0
+
+    def available(self):
+        try:
+            import transformers  # noqa: F401
+            import torch  # noqa: F401
+        except ImportError:
+            return False
+        return self._load_error is None
+
+    def _load(self):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        # Left padding keeps every prompt's last token adjacent to its generated tokens
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, padding_side="left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(self.model_name, torch_dtype=torch.float32)
+        self.model.eval()
+        print(f"Local LLM {self.model_name} loaded")
+
+    def _format(self, prompt):
+        if getattr(self.tokenizer, "chat_template", None):
+            return self.tokenizer.apply_chat_template(
+                [{"role": "user", "content": prompt}], tokenize=False, add_generation_prompt=True
+            )
+        return prompt
+
+    def _generate_batch(self, batch):
+        import torch
+
+        temperature = batch[0][2]
+        inputs = self.tokenizer([self._format(prompt) for prompt, _, _, _ in batch], return_tensors="pt", padding=True)
+        sampling = {"do_sample": True, "temperature": temperature} if temperature > 0 else {"do_sample": False}
+        with torch.inference_mode():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=max(max_new_tokens for _, max_new_tokens, _, _ in batch),
+                pad_token_id=self.tokenizer.pad_token_id,
+                **sampling
+            )
+        generated = output[:, inputs["input_ids"].shape[1]:]
+        return [
+            self.tokenizer.decode(tokens[:max_new_tokens], skip_special_tokens=True).strip()
+            for tokens, (_, max_new_tokens, _, _) in zip(generated, batch)
+        ]
+
+    def _next(self, timeout=None):
+        if self._held:
+            return self._held.popleft()
+        return self._queue.get(timeout=timeout)
+
+    def _next_batch(self):
+        """Block for one request, then gather compatible ones until the batch is full or max_wait passes."""
+        first = self._next()
+        batch = [first]
+        skipped = []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self._held:
+                break
+            try:
+                item = self._next(timeout=max(remaining, 0))
+            except queue.Empty:
+                break
+            (batch if item[2] == first[2] else skipped).append(item)
+        # Requests with a different temperature go first in the next batch
+        self._held.extendleft(reversed(skipped))
+        return batch
+
+    def _run(self):
+        try:
+            self._load()
+        except Exception as e:
+            self._load_error = e
+            print(f"Local LLM failed to load: {e}")
+        while True:
+            batch = self._next_batch()
+            if self._load_error is not None:
+                for *_, future in batch:
+                    future.set_exception(RuntimeError(f"Local LLM unavailable: {self._load_error}"))
+                continue
+            try:
+                texts = self._generate_batch(batch)
+            except Exception as e:
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_prompts += len(batch)
+            for (*_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+    def _generate(self, prompt, max_new_tokens, temperature):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="local-llm", daemon=True)
+                self._worker.start()
+        future = concurrent.futures.Future()
+        self._queue.put((prompt, max_new_tokens, temperature, future))
+        return future.result()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "model": self.model_name,
+            "loaded": self.model is not None,
+            "queue_depth": self._queue.qsize() + len(self._held),
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_prompts / self.batches, 2) if self.batches else 0.0,
+        })
+        return stats
+
+
+class StubBackend(LLMBackend):
+    """Deterministic output after a fixed delay: the same prompt always gets the same text."""
+
+    name = "stub"
+    source = "Generated by the stub LLM backend (testing only)"
+
+    def __init__(self, latency_ms=LLM_STUB_LATENCY_MS):
+        super().__init__()
+        self.latency = latency_ms / 1000
+
+    def _generate(self, prompt, max_new_tokens, temperature):
+        time.sleep(self.latency)
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        # Numbered questions so batch quiz prompts parse; roughly 20 tokens per line
+        lines = max(1, min(10, max_new_tokens // 20))
+        return "\n".join(
+            f"{i}. Stub question {digest}-{i}: what is the first step you would take, and why?"
+            for i in range(1, lines + 1)
+        )
+
+
+BACKENDS = {
+    "hf": HFInferenceBackend,
+    "local": LocalTransformersBackend,
+    "stub": StubBackend,
+}
+_instances = {}
+
+
+def get_backend(name=None):
+    """Shared backend instance for `name` (default: LLM_BACKEND)."""
+    name = (name or LLM_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}', expected one of {sorted(BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
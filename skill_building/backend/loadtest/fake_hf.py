@@ -0,0 +1,61 @@
+"""
+Local stand-in for the HF Inference API text-generation endpoint.
+
+Answers any POST with `[{"generated_text": ...}]` after an injectable
+delay, so the backends can be load-tested without the shared endpoint:
+
+    FAKE_HF_LATENCY_MS=800 uvicorn loadtest.fake_hf:app --port 8900
+    HF_TEXT_GENERATION_MODEL=http://127.0.0.1:8900 uvicorn main_lightweight:app
+
+Latency, jitter and error rate can also be changed at runtime with
+POST /_config; GET /_stats reports how many generations were requested.
+"""
+import asyncio
+import os
+import random
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from llm_backends import StubBackend
+
+app = FastAPI(title="Fake HF Inference API")
+
+config = {
+    "latency_ms": float(os.getenv("FAKE_HF_LATENCY_MS", "500")),
+    "jitter_ms": float(os.getenv("FAKE_HF_JITTER_MS", "100")),
+    "error_rate": float(os.getenv("FAKE_HF_ERROR_RATE", "0")),
+}
+counters = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+_text = StubBackend(latency_ms=0)
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/_stats")
+def stats():
+    return {**counters, "config": config}
+
+
+@app.post("/_config")
+async def set_config(request: Request):
+    config.update({key: float(value) for key, value in (await request.json()).items() if key in config})
+    return config
+
+
+@app.post("/{path:path}")
+async def text_generation(path: str, request: Request):
+    payload = await request.json()
+    counters["requests"] += 1
+    counters["in_flight"] += 1
+    counters["max_in_flight"] = max(counters["max_in_flight"], counters["in_flight"])
+    try:
+        await asyncio.sleep((config["latency_ms"] + random.uniform(0, config["jitter_ms"])) / 1000)
+    finally:
+        counters["in_flight"] -= 1
+    if random.random() < config["error_rate"]:
+        counters["errors"] += 1
+        return JSONResponse({"error": "Model is currently loading"}, status_code=503)
+    max_new_tokens = payload.get("parameters", {}).get("max_new_tokens", 256)
+    return [{"generated_text": _text.generate(payload.get("inputs", ""), max_new_tokens=max_new_tokens)}]
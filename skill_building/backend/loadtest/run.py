@@ -0,0 +1,271 @@
+"""
+Open-loop load generator for the backends.
+
+Starts loadtest.fake_hf (the HF stand-in) and the chosen app as uvicorn
+subprocesses, then fires GET /quiz/{course_id} and POST /generate/scenario
+at a fixed request rate for a fixed time. Requests are sent on schedule
+whether or not earlier ones have finished, so queueing shows up as latency
+instead of a slower send rate. Reports throughput, p50/p95/p99 and error
+rate per endpoint, and compares them with loadtest/baselines/<app>.json.
+In-band fallback answers (200s with an error or fallback sources) count
+as errors.
+
+    python -m loadtest.run --app main_lightweight --rps 20 --duration 30
+    python -m loadtest.run --app main_lightweight --check             # exit 1 on regression
+    python -m loadtest.run --app main_lightweight --update-baseline
+
+Run from the backend directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+APPS = ["main", "main_lightweight", "main_simple", "main_tiered"]
+
+# Mix of curated-library topics and open-ended ones; UNIQUE_TOPIC_RATE of requests get a fresh topic
+SCENARIO_TOPICS = [
+    "job loss", "I got laid off", "market crash", "credit card debt", "buying a first home",
+    "saving for a wedding", "starting a small business", "paying for graduate school",
+    "moving abroad for work", "caring for a sick relative",
+]
+UNIQUE_TOPIC_RATE = 0.3
+COURSE_IDS = [1, 2, 3, 4, 5, 6]
+
+# Regression tolerances against the stored baseline
+LATENCY_TOLERANCE = 0.25
+LATENCY_SLACK_MS = 5.0
+THROUGHPUT_TOLERANCE = 0.10
+ERROR_RATE_SLACK = 0.01
+# The apps answer LLM failures in-band with a 200; these source prefixes mark a degraded answer
+FALLBACK_SOURCES = ("Fallback mode", "RAG system not available")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(module, port, env):
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server for {url} did not become ready within {timeout}s")
+
+
+def outcome(response):
+    """Status label for a response: its status code, or "200 fallback" for an in-band error."""
+    if response.status_code != 200:
+        return response.status_code
+    try:
+        body = response.json()
+    except ValueError:
+        return "200 fallback"
+    if not isinstance(body, dict) or body.get("error"):
+        return "200 fallback"
+    if any(isinstance(source, str) and source.startswith(FALLBACK_SOURCES) for source in body.get("sources") or []):
+        return "200 fallback"
+    return 200
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, endpoint, latency_ms, status):
+        """`status` is an HTTP status, "200 fallback" for an in-band error, or an exception name."""
+        self.samples.setdefault(endpoint, []).append((latency_ms, status))
+
+    def summary(self, elapsed):
+        report = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = np.array([latency for latency, _ in samples])
+            ok = [latency for latency, status in samples if status == 200]
+            statuses = {}
+            for _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            report[endpoint] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(ok) / elapsed, 2),
+                "error_rate": round(1 - len(ok) / len(samples), 4),
+                "p50_ms": round(float(p50), 1),
+                "p95_ms": round(float(p95), 1),
+                "p99_ms": round(float(p99), 1),
+                "statuses": statuses,
+            }
+        return report
+
+
+async def drive(base_url, rps, duration, clients, seed=0):
+    """Send requests at `rps` for `duration` seconds from `clients` simulated client addresses."""
+    rng = random.Random(seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def one(i):
+            headers = {"x-forwarded-for": f"10.0.{i % clients // 256}.{i % clients % 256}"}
+            if rng.random() < 0.5:
+                endpoint, request = "GET /quiz/{course_id}", client.get(f"/quiz/{rng.choice(COURSE_IDS)}", headers=headers)
+            else:
+                topic = rng.choice(SCENARIO_TOPICS)
+                if rng.random() < UNIQUE_TOPIC_RATE:
+                    topic = f"{topic} (case {i})"
+                endpoint, request = "POST /generate/scenario", client.post("/generate/scenario", json={"topic": topic}, headers=headers)
+            start = time.monotonic()
+            try:
+                status = outcome(await request)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            recorder.add(endpoint, (time.monotonic() - start) * 1000, status)
+
+        tasks = []
+        start = time.monotonic()
+        for i in range(int(rps * duration)):
+            delay = start + i / rps - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(i)))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+    return recorder.summary(elapsed), elapsed
+
+
+def compare(report, baseline):
+    """Regressions of `report` against `baseline`, as readable strings."""
+    problems = []
+    for endpoint, base in baseline["endpoints"].items():
+        current = report["endpoints"].get(endpoint)
+        if current is None:
+            problems.append(f"{endpoint}: missing from this run")
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = base[key] * (1 + LATENCY_TOLERANCE) + LATENCY_SLACK_MS
+            if current[key] > limit:
+                problems.append(f"{endpoint}: {key} {current[key]} > {round(limit, 1)} (baseline {base[key]})")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - THROUGHPUT_TOLERANCE):
+            problems.append(f"{endpoint}: throughput {current['throughput_rps']} rps < baseline {base['throughput_rps']}")
+        if current["error_rate"] > base["error_rate"] + ERROR_RATE_SLACK:
+            problems.append(f"{endpoint}: error rate {current['error_rate']} > baseline {base['error_rate']}")
+    return problems
+
+
+def run(args):
+    fake_port, app_port = free_port(), free_port()
+    db_dir = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(os.environ)
+    env.update({
+        "FAKE_HF_LATENCY_MS": str(args.hf_latency_ms),
+        "FAKE_HF_JITTER_MS": str(args.hf_jitter_ms),
+        "FAKE_HF_ERROR_RATE": str(args.hf_error_rate),
+        "HF_TEXT_GENERATION_MODEL": f"http://127.0.0.1:{fake_port}",
+        "HUGGINGFACEHUB_API_TOKEN": env.get("HUGGINGFACEHUB_API_TOKEN") or "loadtest",
+        "LLM_BACKEND": args.llm_backend,
+        "DATABASE_URL": f"sqlite:///{os.path.join(db_dir, 'loadtest.db')}",
+        # The harness stands in for the reverse proxy that sets X-Forwarded-For
+        "ADMISSION_TRUSTED_PROXIES": "1",
+    })
+
+    processes = []
+    try:
+        processes.append(start_server("loadtest.fake_hf", fake_port, env))
+        wait_ready(f"http://127.0.0.1:{fake_port}", processes[-1])
+        processes.append(start_server(args.app, app_port, env))
+        wait_ready(f"http://127.0.0.1:{app_port}", processes[-1])
+        if args.warmup:
+            time.sleep(args.warmup)
+
+        endpoints, elapsed = asyncio.run(drive(f"http://127.0.0.1:{app_port}", args.rps, args.duration, args.clients))
+        upstream = httpx.get(f"http://127.0.0.1:{fake_port}/_stats").json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+    return {
+        "app": args.app,
+        "params": {
+            "rps": args.rps, "duration": args.duration, "clients": args.clients, "llm_backend": args.llm_backend,
+            "hf_latency_ms": args.hf_latency_ms, "hf_jitter_ms": args.hf_jitter_ms, "hf_error_rate": args.hf_error_rate,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "upstream_calls": upstream["requests"],
+        "endpoints": endpoints,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=APPS, default="main_lightweight")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--clients", type=int, default=200, help="distinct X-Forwarded-For addresses")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds to let background pools fill first")
+    parser.add_argument("--llm-backend", default="hf", help="LLM_BACKEND for the app (hf goes to the fake server)")
+    parser.add_argument("--hf-latency-ms", type=float, default=500)
+    parser.add_argument("--hf-jitter-ms", type=float, default=100)
+    parser.add_argument("--hf-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    parser.add_argument("--check", action="store_true", help="exit 1 if the run regresses against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.app}.json")
+    if args.update_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline["params"] != report["params"]:
+        print(f"Baseline was recorded with different parameters ({baseline['params']}); not comparing")
+        return 0
+    problems = compare(report, baseline)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if not problems:
+        print("No regressions against baseline")
+    return 1 if problems and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,51 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, Integer, String, Float
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from rag.pipeline import query_rag, hybrid_retriever
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from rag.pipeline import (
+    query_rag, generate_with_context, generate_from_docs, retrieve, embed_texts, get_chunk, hybrid_retriever, llm_backend,
+    source_refs
+)
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
 import os
+import orjson
 from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import engine, Base, User, get_or_create_users, get_session
+from quiz_pool import QuizPool
+from attempts import attempt_record, persist_attempts
+from grading import grade_batch, thresholds
+from srs import due_count, item_key_for, next_due, record_reviews
+from write_behind import WriteBehindBuffer
+from singleflight import SingleFlight
+from http_cache import HTTPCacheMiddleware, ResponseCache
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, rejection_handler
+from quiz_batch import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, batch_prompt, parse_questions
+from scenario_library import ScenarioLibrary, scenario_response
+from scenario_sessions import SessionCache
+from tracing import TracingMiddleware, metrics_text, span
 
 load_dotenv()
-app = FastAPI(title="Skill Building API", version="1.0.0")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialised with orjson."""
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+app = FastAPI(title="Skill Building API", version="1.0.0", default_response_class=FastJSONResponse)
+
+# Bound concurrent LLM calls; excess is rejected with Retry-After instead of queueing
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware)
+app.add_exception_handler(AdmissionRejected, rejection_handler)
+
+# Source chunks are content-addressed; generated quiz/scenario responses are not cached
+response_cache = ResponseCache()
+app.add_middleware(HTTPCacheMiddleware, rules={"/sources/": "public, max-age=86400, immutable"}, cache=response_cache)
 
 # Configure CORS
 app.add_middleware(
@@ -24,23 +61,117 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Outermost, so request latency includes admission queueing and compression
+app.add_middleware(TracingMiddleware)
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./skill_building.db")
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-class Base(DeclarativeBase):
-    pass
+Base.metadata.create_all(bind=engine)
 
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True)
-    skill_level = Column(Float, default=0.5)
+COURSE_IDS = [1, 2, 3, 4, 5, 6]
+QUIZ_PROMPT = "Generate ONE clear, specific quiz question about budgeting strategies for beginners. Make it concise and educational."
+QUIZ_TOPIC = "budgeting strategies for beginners"
+QUIZ_POOL_BATCH = 5
 
-Base.metadata.create_all(bind=engine)
+# Identical concurrent questions share one retrieval + LLM call
+rag_flight = SingleFlight("query_rag")
+
+async def coalesced_query_rag(question):
+    return await rag_flight.do(question, query_rag, question, hybrid_retriever)
+
+def quiz_item(result):
+    return {
+        "question": result["result"],
+        "sources": source_refs(result["source_documents"])
+    }
+
+def generate_quiz_batch(n):
+    """Retrieve context once and ask for n questions in one LLM call (blocking)."""
+    result = generate_with_context(QUIZ_TOPIC, lambda context: batch_prompt(QUIZ_TOPIC, n, context), hybrid_retriever)
+    return parse_questions(result["result"], n), source_refs(result["source_documents"])
+
+def generate_quiz_questions(course_id):
+    """Refill the pool with one batched RAG generation (blocking)."""
+    questions, sources = generate_quiz_batch(QUIZ_POOL_BATCH)
+    return [{"question": question, "sources": sources} for question in questions]
+
+quiz_pool = QuizPool(generate_quiz_questions)
+
+@app.on_event("startup")
+async def start_quiz_pool():
+    if hybrid_retriever is not None:
+        quiz_pool.start(COURSE_IDS)
+
+@app.on_event("shutdown")
+async def stop_quiz_pool():
+    await quiz_pool.stop()
+
+# Quiz answers are buffered and written in batched transactions
+attempt_buffer = WriteBehindBuffer(persist_attempts, name="quiz_attempts")
+
+@app.on_event("startup")
+async def start_attempt_buffer():
+    attempt_buffer.start()
+
+@app.on_event("shutdown")
+async def stop_attempt_buffer():
+    await attempt_buffer.stop()
+
+# Curated scenarios matched by MiniLM similarity before falling back to RAG generation
+# (exact topic/alias matches only when the embedding model failed to load)
+scenario_library = ScenarioLibrary(
+    embed_texts if hybrid_retriever is not None else None,
+    "sentence-transformers/all-MiniLM-L6-v2"
+)
+
+@app.on_event("startup")
+async def warm_scenario_library():
+    await run_in_threadpool(scenario_library.warm)
+
+# Multi-turn scenarios keep their retrieved chunks and a condensed history between turns
+scenario_sessions = SessionCache()
+
+def scenario_follow_up(session, question):
+    """Answer a follow-up from the session's chunks, retrieving only if the question drifts (blocking)."""
+    if session.needs_retrieval(question):
+        session.add_docs(retrieve(question, hybrid_retriever))
+        scenario_sessions.retrievals_extended += 1
+    else:
+        scenario_sessions.retrievals_reused += 1
+    result = generate_from_docs(session.docs, lambda context: session.prompt(question, context))
+    session.add_turn(question, result["result"])
+    return result
 
 class ScenarioRequest(BaseModel):
     topic: str
+    session_id: Optional[str] = None
+
+class AnswerRequest(BaseModel):
+    response: str
+    username: str = "anonymous"
+    course_id: Optional[int] = None
+    question_id: Optional[int] = None
+    question: Optional[str] = None
+    correct: Optional[bool] = None
+
+class GradeItem(BaseModel):
+    question: str = ""
+    reference: str
+    answer: str
+
+class GradeRequest(BaseModel):
+    items: List[GradeItem] = Field(max_length=1000)
+
+class ReviewRequest(BaseModel):
+    grade: int = Field(ge=0, le=5)
+    item_key: Optional[str] = None
+    course_id: Optional[int] = None
+    prompt: Optional[str] = None
+
+    @model_validator(mode="after")
+    def require_item(self):
+        if not self.item_key and not self.prompt:
+            raise ValueError("either item_key or prompt is required")
+        return self
 
 # Health Check Endpoint
 @app.get("/")
@@ -51,9 +182,42 @@ def health_check():
 def health():
     return {"status": "ok"}
 
+@app.get("/stats")
+def stats():
+    return {
+        "quiz_pool": quiz_pool.stats(),
+        "coalescing": rag_flight.stats(),
+        "http_cache": response_cache.stats(),
+        "attempt_buffer": attempt_buffer.stats(),
+        "scenario_library": scenario_library.stats(),
+        "scenario_sessions": scenario_sessions.stats(),
+        "admission": admission.stats(),
+        "llm": llm_backend.stats() if llm_backend is not None else None
+    }
+
+# Per-stage and per-route latency histograms in the Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metrics_text(), media_type="text/plain; version=0.0.4")
+
+# Full text for a source chunk referenced by id in quiz/scenario responses
+@app.get("/sources/{chunk_id}")
+def get_source(chunk_id: str, response: Response):
+    doc = get_chunk(chunk_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Source chunk not found")
+    # Ids are content hashes, so a given id always maps to the same text
+    response.headers["Cache-Control"] = "public, max-age=86400, immutable"
+    return {
+        "id": chunk_id,
+        "text": doc.page_content,
+        "source": os.path.basename(doc.metadata.get("source", "")),
+        "page": doc.metadata.get("page")
+    }
+
 # Updated Quiz Endpoint
 @app.get("/quiz/{course_id}")
-def get_quiz(course_id: int):
+async def get_quiz(course_id: int):
     try:
         if hybrid_retriever is None:
             return {
@@ -62,22 +226,133 @@ def get_quiz(course_id: int):
                 "sources": ["RAG system not available - using sample data"]
             }
         
-        # Example: Adapt question based on course/user
-        question = "Generate ONE clear, specific quiz question about budgeting strategies for beginners. Make it concise and educational."
-        result = query_rag(question, hybrid_retriever)
+        # Serve a pre-generated question; generate inline only when the pool is empty
+        with span("quiz_pool_pop"):
+            item = await quiz_pool.pop(course_id)
+        if item is None:
+            async with admission.admit():
+                item = quiz_item(await coalesced_query_rag(QUIZ_PROMPT))
+        return {
+            "questions": [item["question"]],
+            "sources": item["sources"]
+        }
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {"error": str(e), "questions": ["Error loading quiz"], "sources": []}
+
+# Batch Quiz Endpoint - one retrieval and one generation for the whole quiz
+@app.get("/quiz/{course_id}/batch")
+async def get_quiz_batch(course_id: int, n: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE)):
+    try:
+        if hybrid_retriever is None:
+            return {
+                "error": "RAG system not initialized. Please check backend logs and ensure HuggingFace API token is set.",
+                "questions": ["Sample Question: What is the 50/30/20 budgeting rule?"],
+                "sources": ["RAG system not available - using sample data"]
+            }
+        
+        async with admission.admit():
+            questions, sources = await rag_flight.do(("quiz_batch", n), generate_quiz_batch, n)
+        if not questions:
+            raise ValueError("Model returned no parseable questions")
         return {
-            "questions": [result["result"]], 
-            "sources": [doc.page_content for doc in result["source_documents"]]
+            "questions": questions,
+            "sources": sources
         }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         return {"error": str(e), "questions": ["Error loading quiz"], "sources": []}
 
-# Updated Scenario Endpoint
+# Record a quiz answer; skill_level is updated when the batch is flushed
+@app.post("/quiz/answer", status_code=202)
+async def submit_answer(request: AnswerRequest):
+    pending = attempt_buffer.add(attempt_record(**request.model_dump()))
+    return {"status": "queued", "pending": pending}
+
+# Grade a batch of free-text answers against reference answers with embeddings (no LLM call)
+@app.post("/quiz/grade")
+async def grade_answers(request: GradeRequest):
+    items = [item.model_dump() for item in request.items]
+    try:
+        grades = await run_in_threadpool(grade_batch, items, embed_texts)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"grades": grades, "thresholds": thresholds()}
+
+@app.get("/users/{username}")
+async def get_user(username: str, session: AsyncSession = Depends(get_session)):
+    user = await session.scalar(select(User).where(User.username == username))
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"username": user.username, "skill_level": round(user.skill_level, 3)}
+
+# Spaced repetition: next due review and grading a review
+@app.get("/review/{username}/next")
+async def get_next_review(username: str, session: AsyncSession = Depends(get_session)):
+    user = await session.scalar(select(User).where(User.username == username))
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    item = await next_due(session, user.id)
+    if item is None:
+        return {"item": None, "due": 0}
+    return {
+        "item": {
+            "item_key": item.item_key,
+            "course_id": item.course_id,
+            "prompt": item.prompt,
+            "due_at": item.due_at.isoformat(),
+            "interval_days": item.interval_days
+        },
+        "due": await due_count(session, user.id)
+    }
+
+@app.post("/review/{username}")
+async def submit_review(username: str, request: ReviewRequest, session: AsyncSession = Depends(get_session)):
+    item_key = request.item_key or item_key_for(request.course_id, request.prompt)
+    async with session.begin():
+        users = await get_or_create_users(session, [username])
+        (item,) = await record_reviews(session, [{
+            "user_id": users[username].id,
+            "item_key": item_key,
+            "grade": request.grade,
+            "course_id": request.course_id,
+            "prompt": request.prompt
+        }])
+        return {
+            "item_key": item.item_key,
+            "due_at": item.due_at.isoformat(),
+            "interval_days": item.interval_days,
+            "ease": round(item.ease, 3),
+            "repetitions": item.repetitions
+        }
+
+# Updated Scenario Endpoint - pass the returned session_id back to ask a follow-up
 @app.post("/generate/scenario")
-def generate_scenario(request: ScenarioRequest):
+async def generate_scenario(request: ScenarioRequest):
     try:
+        session = scenario_sessions.get(request.session_id)
+        if session is not None and hybrid_retriever is not None:
+            async with admission.admit():
+                result = await run_in_threadpool(scenario_follow_up, session, request.topic)
+            return {
+                "scenario": result["result"],
+                "sources": source_refs(result["source_documents"]),
+                "session_id": session.session_id
+            }
+        
+        with span("scenario_library_match"):
+            match = await run_in_threadpool(scenario_library.match, request.topic)
+        if match is not None:
+            session = scenario_sessions.create(request.topic)
+            session.add_turn(request.topic, match["scenario"])
+            return {**scenario_response(match), "session_id": session.session_id}
+        
         if hybrid_retriever is None:
             return {
                 "error": "RAG system not initialized. Please check backend logs and ensure HuggingFace API token is set.",
@@ -85,11 +360,18 @@ def generate_scenario(request: ScenarioRequest):
                 "sources": ["RAG system not available"]
             }
         
-        result = query_rag(request.topic, hybrid_retriever)
+        async with admission.admit():
+            result = await coalesced_query_rag(request.topic)
+        session = scenario_sessions.create(request.topic)
+        session.add_docs(result["source_documents"])
+        session.add_turn(request.topic, result["result"])
         return {
             "scenario": result["result"], 
-            "sources": [doc.page_content for doc in result["source_documents"]]
+            "sources": source_refs(result["source_documents"]),
+            "session_id": session.session_id
         }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
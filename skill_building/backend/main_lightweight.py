@@ -1,13 +1,36 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import os
 from dotenv import load_dotenv
+from quiz_pool import QuizPool
+from singleflight import SingleFlight
+from http_cache import HTTPCacheMiddleware, ResponseCache
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, rejection_handler
+from quiz_batch import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, batch_prompt, max_new_tokens_for, parse_questions
+from llm_backends import get_backend
+from scenario_library import HASHING_MATCH_THRESHOLD, ScenarioLibrary, hashing_embed, scenario_response
 
 load_dotenv()
 
 app = FastAPI(title="Skill Building API - Lightweight", version="1.0.0")
 
+# Bound concurrent HF calls; excess is rejected with Retry-After instead of queueing
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware)
+app.add_exception_handler(AdmissionRejected, rejection_handler)
+
+# Generated and error-fallback responses opt out with Cache-Control: no-store; only curated library matches get cached
+response_cache = ResponseCache()
+app.add_middleware(
+    HTTPCacheMiddleware,
+    rules={
+        "/quiz/": "public, max-age=60",
+        "/generate/scenario": "public, max-age=60",
+    },
+    cache=response_cache,
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +49,73 @@ app.add_middleware(
 class ScenarioRequest(BaseModel):
     topic: str
 
+COURSE_IDS = [1, 2, 3, 4, 5, 6]
+# HF Inference API by default; LLM_BACKEND=local or stub for offline serving and load tests
+llm = get_backend()
+LLM_SOURCE = llm.source
+
+# Course-specific topics and prompts
+COURSE_TOPICS = {
+    1: "budgeting strategies for beginners, specifically about the 50/30/20 rule",
+    2: "emergency funds and why they are important",
+    3: "the difference between stocks and bonds",
+    4: "strategies to pay off high-interest debt",
+    5: "retirement planning and IRA accounts",
+    6: "common tax deductions for individuals"
+}
+QUIZ_PROMPTS = {course_id: f"Generate one concise quiz question about {topic}." for course_id, topic in COURSE_TOPICS.items()}
+
+# Curated questions used when the HF API is unavailable
+FALLBACK_QUESTIONS = {
+    1: "What is the 50/30/20 budgeting rule and how does it help manage personal finances?",
+    2: "Why is an emergency fund important and how many months of expenses should it cover?",
+    3: "What is the difference between stocks and bonds in an investment portfolio?",
+    4: "What strategies can help you pay off high-interest debt faster?",
+    5: "What are the key differences between a Traditional IRA and a Roth IRA?",
+    6: "What tax deductions are commonly available for individuals?"
+}
+
+def text_generation(prompt, max_new_tokens):
+    """Generate with the configured LLM backend (blocking, raises on backend errors)."""
+    return llm.generate(prompt, max_new_tokens=max_new_tokens, temperature=0.7)
+
+# Identical concurrent prompts share one upstream call
+generation_flight = SingleFlight("text_generation")
+
+async def coalesced_text_generation(prompt, max_new_tokens):
+    return await generation_flight.do((prompt, max_new_tokens), text_generation, prompt, max_new_tokens)
+
+def quiz_prompt(course_id):
+    return QUIZ_PROMPTS.get(course_id, "Generate a financial literacy quiz question.")
+
+def generate_quiz_batch(course_id, n):
+    """Ask the LLM for n questions in one generation (blocking)."""
+    topic = COURSE_TOPICS.get(course_id, "financial literacy")
+    return parse_questions(text_generation(batch_prompt(topic, n), max_new_tokens_for(n)), n)
+
+QUIZ_POOL_BATCH = 5
+
+def generate_quiz_questions(course_id):
+    """Refill the pool with one batched generation (blocking)."""
+    return [{"question": question, "sources": [LLM_SOURCE]} for question in generate_quiz_batch(course_id, QUIZ_POOL_BATCH)]
+
+quiz_pool = QuizPool(generate_quiz_questions)
+
+@app.on_event("startup")
+async def start_quiz_pool():
+    quiz_pool.start(COURSE_IDS)
+
+@app.on_event("shutdown")
+async def stop_quiz_pool():
+    await quiz_pool.stop()
+
+# Curated scenarios matched locally (no model download, no API call) before asking the LLM
+scenario_library = ScenarioLibrary(hashing_embed, "hashing-4096", HASHING_MATCH_THRESHOLD)
+
+@app.on_event("startup")
+async def warm_scenario_library():
+    await run_in_threadpool(scenario_library.warm)
+
 # Health Check
 @app.get("/")
 def health_check():
@@ -35,89 +125,88 @@ def health_check():
 def health():
     return {"status": "ok"}
 
+@app.get("/stats")
+def stats():
+    return {
+        "quiz_pool": quiz_pool.stats(),
+        "coalescing": generation_flight.stats(),
+        "http_cache": response_cache.stats(),
+        "scenario_library": scenario_library.stats(),
+        "admission": admission.stats(),
+        "llm": llm.stats()
+    }
+
 # Lightweight Quiz - Uses HuggingFace API directly without RAG
 @app.get("/quiz/{course_id}")
-async def get_quiz(course_id: int):
-    from huggingface_hub import InferenceClient
-    
+async def get_quiz(course_id: int, response: Response):
     try:
-        client = InferenceClient(token=os.getenv("HUGGINGFACEHUB_API_TOKEN"))
-        
-        # Course-specific prompts
-        prompts = {
-            1: "Generate one concise quiz question about budgeting strategies for beginners, specifically about the 50/30/20 rule.",
-            2: "Generate one concise quiz question about emergency funds and why they are important.",
-            3: "Generate one concise quiz question about the difference between stocks and bonds.",
-            4: "Generate one concise quiz question about strategies to pay off high-interest debt.",
-            5: "Generate one concise quiz question about retirement planning and IRA accounts.",
-            6: "Generate one concise quiz question about common tax deductions for individuals."
-        }
-        
-        prompt = prompts.get(course_id, "Generate a financial literacy quiz question.")
-        
-        # Use a lightweight model
-        response = client.text_generation(
-            prompt,
-            model="HuggingFaceH4/zephyr-7b-beta",
-            max_new_tokens=150,
-            temperature=0.7
-        )
+        # Serve a pre-generated question; generate inline only when the pool is empty
+        item = await quiz_pool.pop(course_id)
+        if item is None:
+            async with admission.admit():
+                question = await coalesced_text_generation(quiz_prompt(course_id), 150)
+            item = {"question": question, "sources": [LLM_SOURCE]}
         
+        response.headers["Cache-Control"] = "no-store"
         return {
-            "questions": [response.strip()],
-            "sources": ["Generated using HuggingFace Zephyr-7B model"]
+            "questions": [item["question"]],
+            "sources": item["sources"]
         }
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        # Fallback to curated questions
-        fallback_questions = {
-            1: "What is the 50/30/20 budgeting rule and how does it help manage personal finances?",
-            2: "Why is an emergency fund important and how many months of expenses should it cover?",
-            3: "What is the difference between stocks and bonds in an investment portfolio?",
-            4: "What strategies can help you pay off high-interest debt faster?",
-            5: "What are the key differences between a Traditional IRA and a Roth IRA?",
-            6: "What tax deductions are commonly available for individuals?"
+        # Fallback to curated questions; the body carries this request's error, so don't share it
+        response.headers["Cache-Control"] = "no-store"
+        return {
+            "questions": [FALLBACK_QUESTIONS.get(course_id, "What are the basic principles of financial literacy?")],
+            "sources": [f"Fallback mode - Error: {str(e)}"]
         }
+
+# Batch Quiz - many questions from a single LLM call
+@app.get("/quiz/{course_id}/batch")
+async def get_quiz_batch(response: Response, course_id: int, n: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE)):
+    try:
+        async with admission.admit():
+            questions = await generation_flight.do(("quiz_batch", course_id, n), generate_quiz_batch, course_id, n)
+        if not questions:
+            raise ValueError("Model returned no parseable questions")
         
+        response.headers["Cache-Control"] = "no-store"
+        return {
+            "questions": questions,
+            "sources": [LLM_SOURCE]
+        }
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        response.headers["Cache-Control"] = "no-store"
         return {
-            "questions": [fallback_questions.get(course_id, "What are the basic principles of financial literacy?")],
+            "questions": [FALLBACK_QUESTIONS.get(course_id, "What are the basic principles of financial literacy?")],
             "sources": [f"Fallback mode - Error: {str(e)}"]
         }
 
 # Lightweight Scenario Generator
 @app.post("/generate/scenario")
-async def generate_scenario(request: ScenarioRequest):
-    from huggingface_hub import InferenceClient
+async def generate_scenario(request: ScenarioRequest, response: Response):
+    match = scenario_library.match(request.topic)
+    if match is not None:
+        return scenario_response(match)
     
     try:
-        client = InferenceClient(token=os.getenv("HUGGINGFACEHUB_API_TOKEN"))
-        
         prompt = f"Generate a realistic financial scenario about: {request.topic}. Include the situation and 2-3 action steps someone should consider. Keep it under 200 words."
         
-        response = client.text_generation(
-            prompt,
-            model="HuggingFaceH4/zephyr-7b-beta",
-            max_new_tokens=250,
-            temperature=0.7
-        )
+        async with admission.admit():
+            scenario = await coalesced_text_generation(prompt, 250)
         
+        response.headers["Cache-Control"] = "no-store"
         return {
-            "scenario": response.strip(),
-            "sources": ["Generated using HuggingFace Zephyr-7B model"]
+            "scenario": scenario,
+            "sources": [LLM_SOURCE]
         }
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        # Fallback scenarios
-        scenarios = {
-            "market crash": "Scenario: The stock market has dropped 20% in one week. Your retirement portfolio has lost significant value. What should you do? Consider: 1) Don't panic sell, 2) Review your asset allocation, 3) Consider if you need to rebalance, 4) Remember your long-term goals.",
-            "emergency fund": "Scenario: Your car breaks down and needs $1,500 in repairs. You have $2,000 in your emergency fund. How do you handle this? Consider: 1) Use emergency fund for the repair, 2) Get quotes from multiple mechanics, 3) Plan to rebuild the fund, 4) Review your budget.",
-            "job loss": "Scenario: You've been laid off unexpectedly. You have 3 months of expenses saved. What's your action plan? Consider: 1) File for unemployment, 2) Cut non-essential expenses, 3) Update resume and start job search, 4) Consider temporary work.",
-            "debt": "Scenario: You have $10,000 in credit card debt at 18% APR. How do you tackle this? Consider: 1) Stop using credit cards, 2) Pay more than minimum, 3) Consider debt avalanche or snowball method, 4) Look into balance transfer options."
-        }
-        
-        topic_lower = request.topic.lower()
-        for key in scenarios:
-            if key in topic_lower:
-                return {"scenario": scenarios[key], "sources": ["Curated content"]}
-        
+        response.headers["Cache-Control"] = "no-store"
         return {
             "scenario": f"Sample scenario for '{request.topic}': This is placeholder content. API error: {str(e)}",
             "sources": ["Fallback mode"]
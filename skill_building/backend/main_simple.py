@@ -1,9 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from http_cache import HTTPCacheMiddleware, ResponseCache
+from scenario_library import HASHING_MATCH_THRESHOLD, ScenarioLibrary, hashing_embed, scenario_response
 
 app = FastAPI(title="Skill Building API", version="1.0.0")
 
+# Both content endpoints are pure functions of their input, so let browsers/CDNs and the server cache them
+response_cache = ResponseCache()
+app.add_middleware(
+    HTTPCacheMiddleware,
+    rules={
+        "/quiz/": "public, max-age=3600",
+        "/generate/scenario": "public, max-age=3600",
+    },
+    cache=response_cache,
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +29,8 @@ app.add_middleware(
 class ScenarioRequest(BaseModel):
     topic: str
 
+scenario_library = ScenarioLibrary(hashing_embed, "hashing-4096", HASHING_MATCH_THRESHOLD)
+
 # Health Check Endpoint
 @app.get("/")
 def health_check():
@@ -25,6 +40,13 @@ def health_check():
 def health():
     return {"status": "ok"}
 
+@app.get("/stats")
+def stats():
+    return {
+        "http_cache": response_cache.stats(),
+        "scenario_library": scenario_library.stats()
+    }
+
 # Sample Quiz Endpoint (without RAG)
 @app.get("/quiz/{course_id}")
 def get_quiz(course_id: int):
@@ -48,21 +70,15 @@ def get_quiz(course_id: int):
         ]
     }
 
-# Sample Scenario Endpoint (without RAG)
+# Sample Scenario Endpoint (without RAG) - nearest match from the curated library
 @app.post("/generate/scenario")
 def generate_scenario(request: ScenarioRequest):
-    scenarios = {
-        "market crash": "Scenario: The stock market has dropped 20% in one week. Your retirement portfolio has lost significant value. What should you do? Consider: 1) Don't panic sell, 2) Review your asset allocation, 3) Consider if you need to rebalance, 4) Remember your long-term goals.",
-        "emergency fund": "Scenario: Your car breaks down and needs $1,500 in repairs. You have $2,000 in your emergency fund. How do you handle this? Consider: 1) Use emergency fund for the repair, 2) Get quotes from multiple mechanics, 3) Plan to rebuild the fund, 4) Review your budget to prevent future shortfalls.",
-        "job loss": "Scenario: You've been laid off unexpectedly. You have 3 months of expenses saved. What's your action plan? Consider: 1) File for unemployment, 2) Cut non-essential expenses, 3) Update resume and start job search, 4) Consider temporary work, 5) Review health insurance options.",
-        "debt": "Scenario: You have $10,000 in credit card debt at 18% APR. How do you tackle this? Consider: 1) Stop using credit cards, 2) Pay more than minimum, 3) Consider debt avalanche or snowball method, 4) Look into balance transfer options, 5) Create a strict budget."
-    }
-    
-    topic_lower = request.topic.lower()
-    scenario = scenarios.get(topic_lower, f"Sample scenario for '{request.topic}': This is placeholder content. Configure HuggingFace API for AI-generated scenarios.")
+    match = scenario_library.match(request.topic)
+    if match is not None:
+        return scenario_response(match)
     
     return {
-        "scenario": scenario,
+        "scenario": f"Sample scenario for '{request.topic}': This is placeholder content. Configure HuggingFace API for AI-generated scenarios.",
         "sources": ["Sample data - Configure HuggingFace API token for AI-generated content"]
     }
 
@@ -0,0 +1,140 @@
+from fastapi import FastAPI, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from dotenv import load_dotenv
+from http_cache import HTTPCacheMiddleware, ResponseCache
+from admission import AdmissionMiddleware, AdmissionRejected, rejection_handler
+from quiz_batch import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE
+from tiering import TierRouter, TierUnavailable
+from tracing import TracingMiddleware
+import main as full
+import main_lightweight as lightweight
+import main_simple as simple
+
+load_dotenv()
+
+app = FastAPI(title="Skill Building API - Tiered", version="1.0.0", default_response_class=full.FastJSONResponse)
+
+# The tier handlers charge their own app's admission controller when they call an LLM;
+# this only identifies the client, and rejections are answered rather than degraded
+app.add_middleware(AdmissionMiddleware)
+app.add_exception_handler(AdmissionRejected, rejection_handler)
+
+response_cache = ResponseCache()
+app.add_middleware(HTTPCacheMiddleware, rules={"/sources/": "public, max-age=86400, immutable"}, cache=response_cache)
+
+# Configure CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:3000",
+        "http://localhost:5173",
+        "http://localhost:5174",
+        "https://frontend-j4akmsr1p-sravyas-projects-f5209810.vercel.app",
+        "https://*.vercel.app"
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Outermost, as in main.py; feeds the histograms served by the full app's /metrics
+app.add_middleware(TracingMiddleware)
+
+# Richest first: RAG (main.py), direct HF (main_lightweight.py), static (main_simple.py)
+tier_router = TierRouter([
+    ("full", lambda: full.hybrid_retriever is not None),
+    ("lightweight", lightweight.llm.available),
+    ("simple", None),
+], passthrough=(AdmissionRejected,))
+
+@app.on_event("startup")
+async def start_lightweight_tier():
+    # Both tiers refill the same quiz_pool table; the lightweight refiller is only needed without RAG
+    if full.hybrid_retriever is None and lightweight.llm.available():
+        lightweight.quiz_pool.start(lightweight.COURSE_IDS)
+    await run_in_threadpool(lightweight.scenario_library.warm)
+
+@app.on_event("shutdown")
+async def stop_lightweight_tier():
+    await lightweight.quiz_pool.stop()
+
+def checked(result):
+    """The tiers answer errors in-band; raise instead so the router falls through to the next tier."""
+    if result.get("error"):
+        raise TierUnavailable(result["error"])
+    sources = result.get("sources") or []
+    if sources and isinstance(sources[0], str) and sources[0].startswith("Fallback mode"):
+        raise TierUnavailable(sources[0])
+    return result
+
+async def serve(response, handlers):
+    tier, result = await tier_router.call(handlers)
+    response.headers["X-Serving-Tier"] = tier
+    if tier != tier_router.names[0]:
+        response.headers["X-Degraded-From"] = tier_router.names[0]
+    return result
+
+# Health Check
+@app.get("/")
+def health_check():
+    return {"status": "healthy", "message": "Skill Building API - Tiered Mode", "tiers": tier_router.plan()}
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/stats")
+def stats():
+    return {
+        "tiering": tier_router.stats(),
+        "full": full.stats(),
+        "lightweight": lightweight.stats(),
+        "simple": simple.stats(),
+        "http_cache": response_cache.stats()
+    }
+
+@app.get("/quiz/{course_id}")
+async def get_quiz(course_id: int, response: Response):
+    async def from_full():
+        return checked(await full.get_quiz(course_id))
+
+    async def from_lightweight():
+        return checked(await lightweight.get_quiz(course_id, response))
+
+    async def from_simple():
+        return simple.get_quiz(course_id)
+
+    return await serve(response, {"full": from_full, "lightweight": from_lightweight, "simple": from_simple})
+
+@app.get("/quiz/{course_id}/batch")
+async def get_quiz_batch(response: Response, course_id: int, n: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE)):
+    async def from_full():
+        return checked(await full.get_quiz_batch(course_id, n))
+
+    async def from_lightweight():
+        return checked(await lightweight.get_quiz_batch(response, course_id, n))
+
+    async def from_simple():
+        return simple.get_quiz(course_id)
+
+    return await serve(response, {"full": from_full, "lightweight": from_lightweight, "simple": from_simple})
+
+@app.post("/generate/scenario")
+async def generate_scenario(request: full.ScenarioRequest, response: Response):
+    async def from_full():
+        return checked(await full.generate_scenario(request))
+
+    async def from_lightweight():
+        return checked(await lightweight.generate_scenario(request, response))
+
+    async def from_simple():
+        return simple.generate_scenario(request)
+
+    return await serve(response, {"full": from_full, "lightweight": from_lightweight, "simple": from_simple})
+
+# Everything else (answers, grading, reviews, sources) is served by the full app
+app.include_router(full.app.router)
+
+# Run: uvicorn main_tiered:app --host 0.0.0.0 --port $PORT
@@ -0,0 +1,77 @@
+"""
+Batch quiz generation helpers.
+
+Builds a single prompt asking the model for several questions at once and
+parses the reply, whether the model answered with the requested JSON array
+or fell back to a numbered/bulleted list.
+"""
+import json
+import re
+
+DEFAULT_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 20
+
+# Rough per-question token budget for a concise question plus list markup
+TOKENS_PER_QUESTION = 60
+
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\(?\d+[.):]|Q\d+[.):]?|Question\s*\d+[.):]?)\s*", re.IGNORECASE)
+
+
+def batch_prompt(topic, n, context=None):
+    """Prompt asking for `n` distinct questions as a JSON array of strings."""
+    prompt = (
+        f"Generate {n} different, clear, concise quiz questions about {topic}. "
+        "Each question should test a different idea and be answerable in one or two sentences. "
+        f'Respond with ONLY a JSON array of {n} strings, for example: ["Question one?", "Question two?"]'
+    )
+    if context:
+        prompt = f"Use the following context to write the questions.\n\n{context}\n\n{prompt}"
+    return prompt
+
+
+def max_new_tokens_for(n):
+    return TOKENS_PER_QUESTION * n + 50
+
+
+def parse_questions(text, n):
+    """Extract up to `n` unique questions from a model reply."""
+    questions = _parse_json_array(text)
+    if not questions:
+        questions = _parse_lines(text)
+
+    seen = set()
+    unique = []
+    for question in questions:
+        key = question.lower()
+        if question and key not in seen:
+            seen.add(key)
+            unique.append(question)
+    return unique[:n]
+
+
+def _parse_json_array(text):
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return []
+    if not isinstance(items, list):
+        return []
+
+    questions = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("question", "")
+        if isinstance(item, str):
+            questions.append(item.strip())
+    return questions
+
+
+def _parse_lines(text):
+    lines = [_LIST_MARKER.sub("", line).strip().strip('"') for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    # Prefer lines that read as questions; otherwise take whatever the model listed
+    questions = [line for line in lines if line.endswith("?")]
+    return questions or lines
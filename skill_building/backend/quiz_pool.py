@@ -0,0 +1,180 @@
+"""
+Pre-generated quiz question pool.
+
+Keeps a pool of ready questions per course_id in the database so that
+/quiz/{course_id} is a single DB read. When a course drops below the
+low-water mark a background task refills it, one generation at a time and
+no faster than `min_interval` seconds apart.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, Integer, Text, delete, func, select
+
+from db import Base, async_engine, engine as sync_engine
+
+QUIZ_POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", "10"))
+QUIZ_POOL_LOW_WATER = int(os.getenv("QUIZ_POOL_LOW_WATER", "3"))
+QUIZ_POOL_MIN_INTERVAL = float(os.getenv("QUIZ_POOL_MIN_INTERVAL", "2.0"))
+QUIZ_POOL_RETRY_AFTER = float(os.getenv("QUIZ_POOL_RETRY_AFTER", "60"))
+
+
+class PooledQuestion(Base):
+    __tablename__ = "quiz_pool"
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, nullable=False)
+    question = Column(Text, nullable=False)
+    sources = Column(Text, nullable=False, default="[]")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_quiz_pool_course_id_id", "course_id", "id"),)
+
+
+class QuizPool:
+    """Per-course pool of pre-generated questions with background refill.
+
+    `generate(course_id)` is a blocking callable returning a list of
+    {"question": str, "sources": list} dicts; it runs in a worker thread.
+    Pool reads and writes go through the async engine.
+    """
+
+    def __init__(self, generate, target_size=QUIZ_POOL_SIZE, low_water=QUIZ_POOL_LOW_WATER,
+                 min_interval=QUIZ_POOL_MIN_INTERVAL, retry_after=QUIZ_POOL_RETRY_AFTER, engine=None):
+        self.generate = generate
+        self.target_size = target_size
+        self.low_water = low_water
+        self.min_interval = min_interval
+        self.retry_after = retry_after
+        self.engine = engine or async_engine
+        self.table = PooledQuestion.__table__
+        self.table.create(bind=sync_engine, checkfirst=True)
+
+        self._tasks = {}
+        self._failed_until = {}
+        self._generation_lock = None
+        self._last_generation = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return self.target_size > 0
+
+    # ── Database helpers ─────────────────────────────────────────────────────
+    async def _pop_row(self, course_id):
+        t = self.table
+        for _ in range(3):
+            async with self.engine.begin() as conn:
+                row = (await conn.execute(
+                    select(t.c.id, t.c.question, t.c.sources)
+                    .where(t.c.course_id == course_id)
+                    .order_by(t.c.id)
+                    .limit(1)
+                )).first()
+                if row is None:
+                    return None, 0
+                # Another worker may have taken the same row; retry on a lost race
+                if (await conn.execute(delete(t).where(t.c.id == row.id))).rowcount == 1:
+                    remaining = await self._count(course_id, conn)
+                    return {"question": row.question, "sources": json.loads(row.sources)}, remaining
+        return None, await self._count(course_id)
+
+    async def _count(self, course_id, conn=None):
+        t = self.table
+        query = select(func.count()).select_from(t).where(t.c.course_id == course_id)
+        if conn is not None:
+            return (await conn.execute(query)).scalar()
+        async with self.engine.connect() as conn:
+            return (await conn.execute(query)).scalar()
+
+    async def _push(self, course_id, items):
+        if not items:
+            return
+        async with self.engine.begin() as conn:
+            await conn.execute(self.table.insert(), [
+                {
+                    "course_id": course_id,
+                    "question": item["question"],
+                    "sources": json.dumps(item.get("sources", [])),
+                    "created_at": datetime.utcnow(),
+                }
+                for item in items
+            ])
+
+    # ── Public API ───────────────────────────────────────────────────────────
+    async def pop(self, course_id):
+        """Take one ready question for the course, or None if the pool is empty."""
+        if not self.enabled:
+            return None
+        item, remaining = await self._pop_row(course_id)
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if remaining < self.low_water:
+            self.request_refill(course_id)
+        return item
+
+    def request_refill(self, course_id):
+        """Schedule a background refill unless one is running or backing off."""
+        if not self.enabled:
+            return
+        task = self._tasks.get(course_id)
+        if task is not None and not task.done():
+            return
+        if time.monotonic() < self._failed_until.get(course_id, 0.0):
+            return
+        self._tasks[course_id] = asyncio.create_task(self._refill(course_id))
+
+    async def _refill(self, course_id):
+        if self._generation_lock is None:
+            self._generation_lock = asyncio.Lock()
+        try:
+            while await self._count(course_id) < self.target_size:
+                # One generation at a time across all courses, spaced by min_interval
+                async with self._generation_lock:
+                    wait = self._last_generation + self.min_interval - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    self._last_generation = time.monotonic()
+                    items = await asyncio.to_thread(self.generate, course_id)
+                await self._push(course_id, items)
+                self.generated += len(items)
+                if not items:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            self._failed_until[course_id] = time.monotonic() + self.retry_after
+            print(f"Quiz pool refill failed for course {course_id}: {e}")
+
+    def start(self, course_ids):
+        """Warm the pool for the given courses. Call from a startup handler."""
+        for course_id in course_ids:
+            self.request_refill(course_id)
+
+    async def stop(self):
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "target_size": self.target_size,
+            "low_water": self.low_water,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "generated": self.generated,
+            "errors": self.errors,
+            "refilling": sorted(c for c, t in self._tasks.items() if not t.done()),
+        }
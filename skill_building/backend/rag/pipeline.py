@@ -1,5 +1,8 @@
+import hashlib
 import os
 from dotenv import load_dotenv
+from llm_backends import LLM_BACKEND, get_backend
+import tracing
 
 load_dotenv()
 
@@ -13,11 +16,88 @@ try:
     from langchain_core.prompts import PromptTemplate  # noqa: F401
     from langchain.chains import RetrievalQA
     from langchain_community.retrievers import BM25Retriever
+    from langchain_core.documents import Document
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.embeddings import Embeddings
     # EnsembleRetriever moved between packages across versions
     try:
         from langchain_community.retrievers import EnsembleRetriever
     except ImportError:
         from langchain.retrievers import EnsembleRetriever
+
+    class ScoredEnsembleRetriever(EnsembleRetriever):
+        """EnsembleRetriever that keeps each document's fused RRF score in metadata["score"]."""
+
+        def weighted_reciprocal_rank(self, doc_lists):
+            with tracing.span("ensemble_fusion"):
+                return self._fuse(doc_lists)
+
+        def _fuse(self, doc_lists):
+            scores = {}
+            first_seen = {}
+            for doc_list, weight in zip(doc_lists, self.weights):
+                for rank, doc in enumerate(doc_list, start=1):
+                    key = doc.metadata.get("chunk_id", doc.page_content)
+                    scores[key] = scores.get(key, 0.0) + weight / (rank + self.c)
+                    first_seen.setdefault(key, doc)
+            # Return copies: the stored documents are shared between requests
+            return [
+                Document(page_content=first_seen[key].page_content, metadata={**first_seen[key].metadata, "score": scores[key]})
+                for key in sorted(scores, key=scores.get, reverse=True)
+            ]
+
+    class TracedEmbeddings(Embeddings):
+        """Embeddings wrapper that times query and document embedding as their own stages."""
+
+        def __init__(self, inner):
+            self.inner = inner
+
+        def embed_documents(self, texts):
+            with tracing.span("embed_documents", count=len(texts)):
+                return self.inner.embed_documents(texts)
+
+        def embed_query(self, text):
+            with tracing.span("embed_query"):
+                return self.inner.embed_query(text)
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        """Records LangChain retriever and LLM runs (including each ensemble leg) as tracing spans."""
+
+        def __init__(self):
+            self._spans = {}
+
+        def _start(self, stage, run_id, parent_run_id):
+            parent = self._spans.get(parent_run_id) if parent_run_id else None
+            self._spans[run_id] = tracing.start_span(stage, parent=parent)
+
+        def _end(self, run_id, error=None):
+            span = self._spans.pop(run_id, None)
+            if span is not None:
+                tracing.end_span(span, error=error)
+
+        def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+            name = kwargs.get("name") or (serialized or {}).get("name") or ((serialized or {}).get("id") or ["retriever"])[-1]
+            self._start(f"retriever:{name}", run_id, parent_run_id)
+
+        def on_retriever_end(self, documents, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_retriever_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+            self._start("llm", run_id, parent_run_id)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+            self._start("llm", run_id, parent_run_id)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+    _tracing_callbacks = TracingCallbackHandler()
     _LANGCHAIN_AVAILABLE = True
 except ImportError as e:
     print(f"WARNING: langchain import error: {e}")
@@ -71,11 +151,41 @@ def _init_langchain_components():
     return text_splitter, embeddings, llm
 
 
+# Stable, content-addressed chunk ids so responses can reference chunks instead of inlining them
+SNIPPET_CHARS = 160
+chunk_store = {}
+
+
+def chunk_id_for(doc):
+    key = f"{doc.metadata.get('source', '')}:{doc.metadata.get('page', '')}:{doc.page_content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_chunk(chunk_id):
+    return chunk_store.get(chunk_id)
+
+
+def source_refs(docs):
+    """Compact source descriptors: chunk id, short snippet and fused retrieval score."""
+    refs = []
+    for doc in docs:
+        text = " ".join(doc.page_content.split())
+        refs.append({
+            "id": doc.metadata.get("chunk_id"),
+            "snippet": text[:SNIPPET_CHARS] + ("..." if len(text) > SNIPPET_CHARS else ""),
+            "score": round(doc.metadata.get("score", 0.0), 4),
+        })
+    return refs
+
+
 def build_hybrid_retriever(docs, text_splitter, embeddings):
     splits = text_splitter.split_documents(docs)
+    for split in splits:
+        split.metadata["chunk_id"] = chunk_id_for(split)
+        chunk_store[split.metadata["chunk_id"]] = split
 
-    # Dense retriever (FAISS)
-    dense_store = FAISS.from_documents(splits, embeddings)
+    # Dense retriever (FAISS); query embedding is timed separately from the index search
+    dense_store = FAISS.from_documents(splits, TracedEmbeddings(embeddings))
     dense_retriever = dense_store.as_retriever(search_kwargs={"k": 3})
 
     # Sparse retriever (BM25)
@@ -83,7 +193,7 @@ def build_hybrid_retriever(docs, text_splitter, embeddings):
     sparse_retriever.k = 3
 
     # Hybrid: Ensemble with weights
-    hybrid = EnsembleRetriever(
+    hybrid = ScoredEnsembleRetriever(
         retrievers=[dense_retriever, sparse_retriever],
         weights=[0.7, 0.3],
     )
@@ -96,22 +206,69 @@ def build_hybrid_retriever(docs, text_splitter, embeddings):
     return hybrid
 
 
+# Same wording as RetrievalQA's "stuff" prompt, for backends that bypass LangChain
+STUFF_PROMPT = (
+    "Use the following pieces of context to answer the question at the end. If you don't know the answer, "
+    "just say that you don't know, don't try to make up an answer.\n\n{context}\n\nQuestion: {question}\nHelpful Answer:"
+)
+
+
+def _complete(prompt):
+    with tracing.span("llm"):
+        if llm_backend is not None:
+            return llm_backend.generate(prompt)
+        return _llm.invoke(prompt).content
+
+
 # RAG query function
 def query_rag(question, retriever):
     if retriever is None:
         return {"result": "RAG system not available", "source_documents": []}
+    if llm_backend is not None:
+        return generate_with_context(question, lambda context: STUFF_PROMPT.format(context=context, question=question), retriever)
     qa_chain = RetrievalQA.from_chain_type(
         llm=_llm,
         chain_type="stuff",
         retriever=retriever,
         return_source_documents=True,
     )
-    return qa_chain({"query": question})
+    with tracing.span("rag_query"):
+        return qa_chain({"query": question}, callbacks=[_tracing_callbacks])
+
+
+# Single generation over context retrieved once, for prompts that ask for several outputs
+def generate_with_context(query, build_prompt, retriever):
+    if retriever is None:
+        return {"result": "RAG system not available", "source_documents": []}
+    return generate_from_docs(retrieve(query, retriever), build_prompt)
+
+
+def retrieve(query, retriever):
+    if retriever is None:
+        return []
+    return retriever.invoke(query, config={"callbacks": [_tracing_callbacks]})
+
+
+# Generation over chunks that were already retrieved, e.g. cached for a scenario session
+def generate_from_docs(docs, build_prompt):
+    with tracing.span("prompt_render"):
+        prompt = build_prompt("\n\n".join(doc.page_content for doc in docs))
+    return {"result": _complete(prompt), "source_documents": docs}
+
+
+# Batch embedding with the MiniLM model (one forward pass per call)
+def embed_texts(texts):
+    if _embeddings is None:
+        raise RuntimeError("Embedding model not initialized")
+    return _embeddings.embed_documents(list(texts))
 
 
 # ── Initialize on startup ────────────────────────────────────────────────────
 hybrid_retriever = None
 _llm = None
+_embeddings = None
+# LLM_BACKEND=local / stub replaces the LangChain HF chat model for generation
+llm_backend = None if LLM_BACKEND == "hf" else get_backend()
 
 try:
     if not _LANGCHAIN_AVAILABLE:
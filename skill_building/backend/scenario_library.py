@@ -0,0 +1,171 @@
+"""
+Curated scenario library served ahead of the LLM.
+
+scenarios/library.json holds hand-written scenarios, each with a few
+alternative phrasings of its topic. Every phrasing is embedded once into a
+normalised float16 matrix (cached next to the library as a .npy file and
+rebuilt when the library or the embedder changes), so matching a request
+topic is one embedding plus one matrix-vector product. Topics whose
+nearest phrasing clears the similarity threshold are answered from the
+library; everything else falls through to generation.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+import numpy as np
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+LIBRARY_PATH = os.path.join(SCENARIO_DIR, "library.json")
+# Cosine similarity a topic needs to be served from the library (MiniLM-style embedders)
+SCENARIO_MATCH_THRESHOLD = float(os.getenv("SCENARIO_MATCH_THRESHOLD", "0.7"))
+# Hashed n-gram vectors score paraphrases lower than a sentence model does
+HASHING_MATCH_THRESHOLD = float(os.getenv("SCENARIO_HASHING_THRESHOLD", "0.5"))
+HASHING_DIM = 4096
+
+_TOKEN = re.compile(r"[a-z0-9$%']+")
+
+
+def normalise_topic(topic):
+    return " ".join(_TOKEN.findall(topic.lower()))
+
+
+def _features(text):
+    words = normalise_topic(text).split()
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return features
+
+
+def hashing_embed(texts, dim=HASHING_DIM):
+    """Dependency-free embedder: hashed word, word-pair and character trigram counts.
+
+    Catches rephrasings that share words or word stems ("laid off" / "got
+    laid off from work"), not true synonyms; use a sentence model for those.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            # crc32 rather than hash(): it must be stable across processes for the on-disk cache
+            vectors[row, zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    return vectors
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class ScenarioLibrary:
+    """Nearest-phrasing lookup over the curated scenarios.
+
+    `embed` maps a list of texts to vectors (blocking); `embedder` names it
+    so cached matrices from different models are never mixed. With
+    `embed=None` only exact topic/alias matches are served.
+    """
+
+    def __init__(self, embed, embedder, threshold=SCENARIO_MATCH_THRESHOLD, path=LIBRARY_PATH):
+        with open(path, encoding="utf-8") as f:
+            self.entries = json.load(f)
+        self.embed = embed
+        self.embedder = embedder
+        self.threshold = threshold
+
+        self.phrases = []
+        self.phrase_entry = []
+        for index, entry in enumerate(self.entries):
+            for phrase in [entry["title"], *entry.get("aliases", [])]:
+                self.phrases.append(phrase)
+                self.phrase_entry.append(index)
+        self.phrase_entry = np.array(self.phrase_entry, dtype=np.int32)
+        self.exact = {normalise_topic(phrase): int(i) for phrase, i in zip(self.phrases, self.phrase_entry)}
+
+        digest = hashlib.sha1("\n".join([embedder, *self.phrases]).encode("utf-8")).hexdigest()[:12]
+        self.cache_path = os.path.join(os.path.dirname(path), f"embeddings-{digest}.npy")
+        self._matrix = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _load_matrix(self):
+        with self._lock:
+            if self._matrix is None:
+                if os.path.exists(self.cache_path):
+                    stored = np.load(self.cache_path)
+                else:
+                    stored = _normalise(np.asarray(self.embed(self.phrases), dtype=np.float32)).astype(np.float16)
+                    try:
+                        np.save(self.cache_path, stored)
+                    except OSError as e:
+                        print(f"Could not cache scenario embeddings: {e}")
+                # float16 on disk, float32 for the dot products
+                self._matrix = stored.astype(np.float32)
+        return self._matrix
+
+    def warm(self):
+        """Build or load the phrase matrix (blocking). Call from a startup handler."""
+        if self.embed is not None:
+            try:
+                self._load_matrix()
+            except Exception as e:
+                print(f"Scenario library embeddings unavailable: {e}")
+
+    def _hit(self, index, similarity):
+        entry = self.entries[index]
+        return {
+            "id": entry["id"],
+            "title": entry["title"],
+            "scenario": entry["scenario"],
+            "similarity": round(float(similarity), 3),
+        }
+
+    def match(self, topic):
+        """The curated scenario closest to `topic`, or None below the threshold (blocking)."""
+        index = self.exact.get(normalise_topic(topic))
+        if index is not None:
+            self.hits += 1
+            self.exact_hits += 1
+            return self._hit(index, 1.0)
+        if self.embed is not None:
+            try:
+                matrix = self._load_matrix()
+                vector = _normalise(np.asarray(self.embed([topic]), dtype=np.float32))[0]
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    return self._hit(int(self.phrase_entry[best]), similarities[best])
+            except Exception as e:
+                self.errors += 1
+                print(f"Scenario library lookup failed: {e}")
+        self.misses += 1
+        return None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "phrases": len(self.phrases),
+            "embedder": self.embedder if self.embed is not None else None,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "errors": self.errors,
+        }
+
+
+def scenario_response(match):
+    return {
+        "scenario": match["scenario"],
+        "sources": [f"Curated scenario library: {match['title']}"],
+        "match": {"id": match["id"], "title": match["title"], "similarity": match["similarity"]},
+    }
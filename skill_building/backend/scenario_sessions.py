@@ -0,0 +1,143 @@
+"""
+Session-scoped context for multi-turn scenario conversations.
+
+The first turn of a scenario conversation retrieves chunks for the topic as
+usual; the session keeps those chunks and a condensed history (recent turns,
+answers truncated) in a bounded LRU. Follow-up turns reuse the cached chunks
+and only run retrieval again when the follow-up drifts away from them, in
+which case new chunks are merged into the set. A follow-up that stays on
+topic therefore costs one LLM call and no retrieval.
+"""
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+SCENARIO_SESSION_MAX = int(os.getenv("SCENARIO_SESSION_MAX", "500"))
+SCENARIO_SESSION_TTL = float(os.getenv("SCENARIO_SESSION_TTL", "1800"))
+# Turns kept verbatim in the prompt, and how much of each answer is kept
+SESSION_HISTORY_TURNS = 4
+SESSION_ANSWER_CHARS = 400
+SESSION_MAX_CHUNKS = 8
+# Share of a follow-up's content words that must appear in the cached chunks to skip retrieval
+SESSION_REUSE_OVERLAP = float(os.getenv("SCENARIO_SESSION_REUSE_OVERLAP", "0.5"))
+
+_WORD = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from how i if in is it me my of on or "
+    "should so that the their them then there this to was what when where which who why will "
+    "with would you your about after before more most than what's i'm it's".split()
+)
+
+
+def content_words(text):
+    return {word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS and len(word) > 2}
+
+
+class ScenarioSession:
+    def __init__(self, session_id, topic):
+        self.session_id = session_id
+        self.topic = topic
+        self.docs = []
+        self.history = []
+        self.vocabulary = content_words(topic)
+        self.last_used = time.monotonic()
+
+    def add_docs(self, docs):
+        """Merge retrieved chunks, keeping the first-seen copy and at most SESSION_MAX_CHUNKS."""
+        known = {doc.metadata.get("chunk_id") for doc in self.docs}
+        added = 0
+        for doc in docs:
+            if len(self.docs) >= SESSION_MAX_CHUNKS:
+                break
+            if doc.metadata.get("chunk_id") not in known:
+                self.docs.append(doc)
+                known.add(doc.metadata.get("chunk_id"))
+                self.vocabulary |= content_words(doc.page_content)
+                added += 1
+        return added
+
+    def add_turn(self, question, answer):
+        answer = " ".join(answer.split())
+        if len(answer) > SESSION_ANSWER_CHARS:
+            answer = answer[:SESSION_ANSWER_CHARS] + "..."
+        self.history.append((question, answer))
+        del self.history[:-SESSION_HISTORY_TURNS]
+
+    def needs_retrieval(self, question):
+        """True when too little of the follow-up is covered by the cached chunks."""
+        if not self.docs:
+            return True
+        words = content_words(question)
+        if not words:
+            return False
+        return len(words & self.vocabulary) / len(words) < SESSION_REUSE_OVERLAP
+
+    def prompt(self, question, context):
+        turns = "\n".join(f"User: {q}\nAssistant: {a}" for q, a in self.history)
+        return (
+            "You are helping a learner work through a personal finance scenario. "
+            "Use the context to answer their follow-up, staying consistent with the conversation so far. "
+            "Keep it under 200 words.\n\n"
+            f"Context:\n{context}\n\n"
+            f"Scenario topic: {self.topic}\n"
+            f"{turns}\n"
+            f"User: {question}\nAssistant:"
+        )
+
+
+class SessionCache:
+    """Bounded LRU of ScenarioSession objects with idle expiry."""
+
+    def __init__(self, max_sessions=SCENARIO_SESSION_MAX, ttl=SCENARIO_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.retrievals_reused = 0
+        self.retrievals_extended = 0
+
+    def get(self, session_id):
+        """The live session for `session_id`, or None if it is unknown or expired."""
+        if not session_id:
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and time.monotonic() - session.last_used > self.ttl:
+                del self._sessions[session_id]
+                self.evictions += 1
+                session = None
+            if session is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def create(self, topic):
+        session = ScenarioSession(secrets.token_urlsafe(12), topic)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session
+
+    def stats(self):
+        follow_ups = self.retrievals_reused + self.retrievals_extended
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "retrievals_reused": self.retrievals_reused,
+            "retrievals_extended": self.retrievals_extended,
+            "reuse_rate": round(self.retrievals_reused / follow_ups, 3) if follow_ups else 0.0,
+        }
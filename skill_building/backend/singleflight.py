@@ -0,0 +1,51 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight computation
+and all receive its result (or its exception). Once the computation
+finishes the key is forgotten, so later calls run fresh.
+"""
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls to a blocking function.
+
+    The shared result object is handed to every waiter, so callers must
+    treat it as read-only.
+    """
+
+    def __init__(self, name="singleflight"):
+        self.name = name
+        self._inflight = {}
+        self.calls = 0
+        self.executions = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` in a worker thread, once per in-flight key."""
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is None:
+            self.executions += 1
+            future = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        # Shield so one disconnecting client does not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self):
+        coalesced = self.calls - self.executions
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / self.calls, 3) if self.calls else 0.0,
+            "in_flight": len(self._inflight),
+        }
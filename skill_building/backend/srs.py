@@ -0,0 +1,173 @@
+"""
+Spaced-repetition scheduling (SM-2) for quiz questions.
+
+Each (user, item) pair has an interval, ease factor and due time in the
+`review_items` table. The (user_id, due_at) index makes "what is this
+learner's next due item" a single index seek, and the backlog job
+rebalances overdue reviews for all users in batches of SQL statements.
+
+Run the backlog job from cron with:  python srs.py
+"""
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import (
+    Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint,
+    bindparam, func, select, tuple_, update,
+)
+
+from db import AsyncSessionLocal, Base, User
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Reviews a learner is asked to do per day before the backlog job spreads the rest out
+SRS_DAILY_CAP = int(os.getenv("SRS_DAILY_CAP", "50"))
+SRS_RESCHEDULE_BATCH = int(os.getenv("SRS_RESCHEDULE_BATCH", "1000"))
+
+
+class ReviewItem(Base):
+    __tablename__ = "review_items"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    item_key = Column(String(32), nullable=False)
+    course_id = Column(Integer)
+    prompt = Column(Text)
+    interval_days = Column(Float, nullable=False, default=0.0)
+    ease = Column(Float, nullable=False, default=DEFAULT_EASE)
+    repetitions = Column(Integer, nullable=False, default=0)
+    due_at = Column(DateTime, nullable=False)
+    last_reviewed_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "item_key", name="uq_review_items_user_item"),
+        Index("ix_review_items_user_due", "user_id", "due_at"),
+    )
+
+
+def item_key_for(course_id, prompt):
+    return hashlib.sha1(f"{course_id}:{prompt}".encode("utf-8")).hexdigest()[:32]
+
+
+def sm2(interval_days, ease, repetitions, grade):
+    """One SM-2 step. `grade` is 0-5; below 3 the item starts over."""
+    if grade < 3:
+        repetitions = 0
+        interval_days = 1.0
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval_days = 1.0
+        elif repetitions == 2:
+            interval_days = 6.0
+        else:
+            interval_days = round(interval_days * ease, 2)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    return interval_days, ease, repetitions
+
+
+async def record_reviews(session, reviews):
+    """Apply a batch of reviews: dicts with user_id, item_key, grade, course_id, prompt, reviewed_at.
+
+    Existing items are loaded with one query; new ones are inserted on flush.
+    Returns the updated ReviewItem rows in input order.
+    """
+    if not reviews:
+        return []
+    keys = {(review["user_id"], review["item_key"]) for review in reviews}
+    items = {
+        (item.user_id, item.item_key): item
+        for item in await session.scalars(
+            select(ReviewItem).where(tuple_(ReviewItem.user_id, ReviewItem.item_key).in_(keys))
+        )
+    }
+    updated = []
+    for review in reviews:
+        key = (review["user_id"], review["item_key"])
+        item = items.get(key)
+        if item is None:
+            item = ReviewItem(
+                user_id=review["user_id"], item_key=review["item_key"],
+                course_id=review.get("course_id"), prompt=review.get("prompt"),
+                interval_days=0.0, ease=DEFAULT_EASE, repetitions=0,
+            )
+            session.add(item)
+            items[key] = item
+        reviewed_at = review.get("reviewed_at") or datetime.utcnow()
+        item.interval_days, item.ease, item.repetitions = sm2(item.interval_days, item.ease, item.repetitions, review["grade"])
+        item.due_at = reviewed_at + timedelta(days=item.interval_days)
+        item.last_reviewed_at = reviewed_at
+        updated.append(item)
+    await session.flush()
+    return updated
+
+
+async def next_due(session, user_id, now=None):
+    """The learner's most overdue item, or None. Served by the (user_id, due_at) index."""
+    now = now or datetime.utcnow()
+    return await session.scalar(
+        select(ReviewItem)
+        .where(ReviewItem.user_id == user_id, ReviewItem.due_at <= now)
+        .order_by(ReviewItem.due_at)
+        .limit(1)
+    )
+
+
+async def due_count(session, user_id, now=None):
+    now = now or datetime.utcnow()
+    return await session.scalar(
+        select(func.count()).select_from(ReviewItem)
+        .where(ReviewItem.user_id == user_id, ReviewItem.due_at <= now)
+    )
+
+
+def _spread(rows, daily_cap, now):
+    """Keep the `daily_cap` most overdue items due now; push the rest back one day per cap-sized chunk."""
+    changes = []
+    position = {}
+    for item_id, user_id, due_at in rows:
+        rank = position.get(user_id, 0)
+        position[user_id] = rank + 1
+        if rank >= daily_cap:
+            changes.append({"item_id": item_id, "new_due_at": now + timedelta(days=rank // daily_cap)})
+    return changes
+
+
+async def reschedule_backlog(daily_cap=SRS_DAILY_CAP, batch_users=SRS_RESCHEDULE_BATCH, now=None):
+    """Spread every learner's overdue backlog over the coming days.
+
+    Walks users in id order, `batch_users` at a time: one SELECT fetches the
+    batch's overdue items and one executemany UPDATE moves the ones beyond
+    the daily cap. Returns (users_scanned, items_rescheduled).
+    """
+    now = now or datetime.utcnow()
+    t = ReviewItem.__table__
+    move = update(t).where(t.c.id == bindparam("item_id")).values(due_at=bindparam("new_due_at"))
+    last_user_id = 0
+    users_scanned = 0
+    rescheduled = 0
+    while True:
+        async with AsyncSessionLocal() as session, session.begin():
+            user_ids = (await session.scalars(
+                select(User.id).where(User.id > last_user_id).order_by(User.id).limit(batch_users)
+            )).all()
+            if not user_ids:
+                break
+            rows = (await session.execute(
+                select(t.c.id, t.c.user_id, t.c.due_at)
+                .where(t.c.user_id.between(user_ids[0], user_ids[-1]), t.c.due_at <= now)
+                .order_by(t.c.user_id, t.c.due_at)
+            )).all()
+            changes = _spread(rows, daily_cap, now)
+            if changes:
+                conn = await session.connection()
+                await conn.execute(move, changes)
+            last_user_id = user_ids[-1]
+            users_scanned += len(user_ids)
+            rescheduled += len(changes)
+    return users_scanned, rescheduled
+
+
+if __name__ == "__main__":
+    scanned, moved = asyncio.run(reschedule_backlog())
+    print(f"Rescheduled {moved} overdue reviews across {scanned} users")
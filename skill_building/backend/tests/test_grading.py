@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import grade_batch  # noqa: E402
+
+
+def fake_embed(texts):
+    # One-hot vector per distinct text: identical texts match, different ones score 0
+    return np.eye(max(len(texts), 1), dtype=np.float32)[:len(texts)]
+
+
+def test_all_empty_batch_grades_incorrect_without_embedding():
+    def embed(texts):
+        raise AssertionError("nothing should be embedded")
+
+    grades = grade_batch([{"question": "", "reference": "", "answer": "  "}] * 2, embed)
+    assert [g["grade"] for g in grades] == ["incorrect", "incorrect"]
+    assert [g["similarity"] for g in grades] == [0.0, 0.0]
+
+
+def test_matching_answer_is_correct_and_missing_answer_is_not():
+    grades = grade_batch([
+        {"question": "What is an index fund?", "reference": "A fund tracking a market index", "answer": "A fund tracking a market index"},
+        {"question": "What is an index fund?", "reference": "A fund tracking a market index", "answer": ""},
+    ], fake_embed)
+    assert [g["grade"] for g in grades] == ["correct", "incorrect"]
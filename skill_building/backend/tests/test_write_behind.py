@@ -0,0 +1,53 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from write_behind import WriteBehindBuffer  # noqa: E402
+
+
+def test_failing_batch_is_dropped_after_max_attempts():
+    calls = []
+
+    async def flush(items):
+        calls.append(list(items))
+        raise RuntimeError("constraint violated")
+
+    async def run():
+        buffer = WriteBehindBuffer(flush, max_attempts=3)
+        buffer.add("a")
+        for _ in range(5):
+            await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert calls == [["a"]] * 3
+    assert buffer.pending == 0
+    assert buffer.stats()["dropped"] == 1
+
+
+def test_buffer_drops_oldest_items_beyond_max_pending():
+    buffer = WriteBehindBuffer(lambda items: None, max_pending=2)
+    for item in ("a", "b", "c"):
+        buffer.add(item)
+    flushed = []
+    buffer.flush_fn = flushed.extend
+    asyncio.run(buffer.flush())
+    assert flushed == ["b", "c"]
+    assert buffer.stats()["dropped"] == 1
+
+
+def test_stop_logs_what_it_could_not_write(capsys):
+    async def flush(items):
+        raise RuntimeError("database is down")
+
+    async def run():
+        buffer = WriteBehindBuffer(flush)
+        buffer.add("a")
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert buffer.pending == 0
+    assert "unwritten at shutdown" in capsys.readouterr().out
@@ -0,0 +1,153 @@
+"""
+Latency-aware routing across serving tiers.
+
+Tiers are listed richest first (RAG, direct HF, static). Each keeps a
+rolling window of recent latencies and outcomes; a request goes to the
+richest tier whose window p95 is within the latency SLO and whose error
+rate is acceptable. A tier that fails or runs past the request budget
+falls through to the next one in the same request, and the last tier is
+always tried. Samples age out of the window, so a tier that was routed
+around is tried again once its bad samples expire.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+TIER_LATENCY_SLO_MS = float(os.getenv("TIER_LATENCY_SLO_MS", "8000"))
+TIER_REQUEST_BUDGET_MS = float(os.getenv("TIER_REQUEST_BUDGET_MS", "15000"))
+TIER_MAX_ERROR_RATE = float(os.getenv("TIER_MAX_ERROR_RATE", "0.2"))
+TIER_WINDOW_SECONDS = float(os.getenv("TIER_WINDOW_SECONDS", "60"))
+# Below this many samples a tier is given the benefit of the doubt
+TIER_MIN_SAMPLES = 5
+TIER_MAX_SAMPLES = 500
+
+
+class TierUnavailable(Exception):
+    """Raised by a tier handler whose answer is a fallback rather than the tier's real output."""
+
+
+class TierWindow:
+    """Rolling (time, latency, ok) samples for one tier."""
+
+    def __init__(self, window_seconds=TIER_WINDOW_SECONDS, max_samples=TIER_MAX_SAMPLES):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=max_samples)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, latency_ms, ok):
+        self.samples.append((time.monotonic(), latency_ms, ok))
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return self.samples
+
+    def p95(self):
+        latencies = sorted(latency for _, latency, _ in self._recent())
+        if not latencies:
+            return None
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def error_rate(self):
+        samples = self._recent()
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    def __len__(self):
+        return len(self._recent())
+
+
+class TierRouter:
+    """Pick the richest healthy tier per request and fall through on failure.
+
+    `tiers` is a list of (name, available) pairs, richest first, where
+    `available` is a zero-argument callable or None (always available).
+    Exceptions in `passthrough` are raised to the caller without counting
+    against the tier or falling through.
+    """
+
+    def __init__(self, tiers, slo_ms=TIER_LATENCY_SLO_MS, budget_ms=TIER_REQUEST_BUDGET_MS,
+                 max_error_rate=TIER_MAX_ERROR_RATE, window_seconds=TIER_WINDOW_SECONDS, min_samples=TIER_MIN_SAMPLES,
+                 passthrough=()):
+        self.names = [name for name, _ in tiers]
+        self.available = {name: available for name, available in tiers}
+        self.windows = {name: TierWindow(window_seconds) for name in self.names}
+        self.slo_ms = slo_ms
+        self.budget_ms = budget_ms
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.served = {name: 0 for name in self.names}
+        self.fallthroughs = 0
+        self.passthrough = tuple(passthrough)
+
+    def healthy(self, name):
+        available = self.available[name]
+        if available is not None and not available():
+            return False
+        window = self.windows[name]
+        if len(window) < self.min_samples:
+            return True
+        return window.p95() <= self.slo_ms and window.error_rate() <= self.max_error_rate
+
+    def plan(self):
+        """Tiers to try for the next request, in order; the last tier is always included."""
+        names = [name for name in self.names[:-1] if self.healthy(name)]
+        return names + [self.names[-1]]
+
+    async def call(self, handlers):
+        """Run the request on the best tier. `handlers` maps tier name to a zero-argument coroutine function.
+
+        Returns (tier_name, result). Exceptions from the last tier propagate.
+        """
+        start = time.monotonic()
+        plan = [name for name in self.plan() if name in handlers]
+        for position, name in enumerate(plan):
+            last = position == len(plan) - 1
+            attempt_start = time.monotonic()
+            remaining = self.budget_ms / 1000 - (attempt_start - start)
+            try:
+                if last:
+                    result = await handlers[name]()
+                else:
+                    result = await asyncio.wait_for(handlers[name](), timeout=max(remaining, 0.001))
+            except self.passthrough:
+                raise
+            except Exception as e:
+                self.windows[name].record((time.monotonic() - attempt_start) * 1000, ok=False)
+                if last:
+                    raise
+                self.fallthroughs += 1
+                print(f"Tier {name} failed, falling through: {type(e).__name__}: {e}")
+                continue
+            self.windows[name].record((time.monotonic() - attempt_start) * 1000, ok=True)
+            self.served[name] += 1
+            return name, result
+
+    def stats(self):
+        tiers = {}
+        for name in self.names:
+            window = self.windows[name]
+            p95 = window.p95()
+            tiers[name] = {
+                "healthy": self.healthy(name),
+                "p95_ms": round(p95, 1) if p95 is not None else None,
+                "error_rate": round(window.error_rate(), 3),
+                "samples": len(window),
+                "served": self.served[name],
+                "requests": window.requests,
+                "errors": window.errors,
+            }
+        return {
+            "slo_ms": self.slo_ms,
+            "budget_ms": self.budget_ms,
+            "max_error_rate": self.max_error_rate,
+            "fallthroughs": self.fallthroughs,
+            "tiers": tiers,
+        }
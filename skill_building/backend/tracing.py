@@ -0,0 +1,296 @@
+"""
+Lightweight span tracing and per-stage latency histograms.
+
+Every span, sampled or not, adds its duration to a Prometheus histogram
+for its stage, so /metrics always shows where time goes. Sampled
+requests (TRACE_SAMPLE_RATE, or an incoming W3C `traceparent` with the
+sampled flag) additionally keep full span records. They are exported per
+trace as OTLP/JSON, one line per trace in TRACE_EXPORT_PATH, and POSTed
+to TRACE_OTLP_ENDPOINT (e.g. http://localhost:4318/v1/traces) if set.
+Export happens on a background thread.
+
+With sampling off a span costs two perf_counter() calls and a histogram
+update.
+"""
+import bisect
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "skill-building-api")
+# Seconds; spans from sub-millisecond lookups up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(snapshot.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return "\n".join(lines)
+
+
+stage_latency = Histogram("skill_building_stage_duration_seconds", "Time spent per request stage", ("stage",))
+request_latency = Histogram("skill_building_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attributes",
+                 "start_ns", "start", "error", "trace", "kind")
+
+    def __init__(self, name, parent=None, sampled=None, trace_id=None, parent_id=None, attributes=None, kind=1):
+        self.name = name
+        self.start = time.perf_counter()
+        self.error = None
+        self.kind = kind
+        if parent is not None:
+            sampled = parent.sampled
+            trace_id = parent.trace_id
+            parent_id = parent.span_id
+        self.sampled = bool(sampled)
+        if self.sampled:
+            self.trace_id = trace_id or "%032x" % random.getrandbits(128)
+            self.span_id = "%016x" % random.getrandbits(64)
+            self.parent_id = parent_id or ""
+            self.attributes = dict(attributes or {})
+            self.start_ns = time.time_ns()
+            # Finished spans of the trace, shared with children and exported when the local root ends
+            self.trace = parent.trace if parent is not None else []
+        else:
+            self.trace_id = self.span_id = self.parent_id = None
+            self.attributes = self.trace = None
+            self.start_ns = 0
+
+    def set_attribute(self, key, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+
+def start_span(name, parent=None, **attributes):
+    """Begin a span under `parent` (default: the current span). Finish it with end_span()."""
+    if parent is None:
+        parent = _current_span.get()
+    if parent is None:
+        return Span(name, sampled=random.random() < TRACE_SAMPLE_RATE, attributes=attributes)
+    return Span(name, parent=parent, attributes=attributes)
+
+
+def end_span(span, error=None, stage=True):
+    duration = time.perf_counter() - span.start
+    if stage:
+        stage_latency.observe((span.name,), duration)
+    if not span.sampled:
+        return
+    span.error = error
+    span.trace.append(_otlp_span(span, span.start_ns + int(duration * 1e9)))
+    if not span.parent_id or span.attributes.get("_local_root"):
+        exporter.export(span.trace)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a stage; record it as a child span when the request is sampled."""
+    current = start_span(name, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        _current_span.reset(token)
+        end_span(current, error=e)
+        raise
+    _current_span.reset(token)
+    end_span(current)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span, end_ns):
+    record = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [_attribute(k, v) for k, v in span.attributes.items() if not k.startswith("_")],
+        "status": {"code": 1},
+    }
+    if span.error is not None:
+        record["status"] = {"code": 2, "message": f"{type(span.error).__name__}: {span.error}"}
+    return record
+
+
+class SpanExporter:
+    """Writes finished traces as OTLP/JSON lines and optionally POSTs them to a collector, off the request path."""
+
+    def __init__(self, path=TRACE_EXPORT_PATH, endpoint=TRACE_OTLP_ENDPOINT):
+        self.path = path
+        self.endpoint = endpoint
+        self._queue = queue.Queue(maxsize=10000)
+        self._worker = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+
+    def export(self, spans):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._worker.start()
+        try:
+            self._queue.put_nowait(list(spans))
+        except queue.Full:
+            self.dropped += 1
+
+    def _payload(self, spans):
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "skill_building.tracing"}, "spans": spans}],
+        }]}
+
+    def _run(self):
+        while True:
+            payload = json.dumps(self._payload(self._queue.get()))
+            try:
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(payload + "\n")
+                if self.endpoint:
+                    request = urllib.request.Request(
+                        self.endpoint, data=payload.encode(), headers={"Content-Type": "application/json"}
+                    )
+                    urllib.request.urlopen(request, timeout=5).close()
+                self.exported += 1
+            except Exception as e:
+                self.dropped += 1
+                print(f"Trace export failed: {e}")
+
+
+exporter = SpanExporter()
+
+
+def metrics_text():
+    """All histograms in the Prometheus text exposition format."""
+    return "\n".join([stage_latency.render(), request_latency.render()]) + "\n"
+
+
+_TRACEPARENT = re.compile(r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+
+
+def _parse_traceparent(value):
+    """(trace_id, parent_id, sampled) from a W3C traceparent header, or None if it is malformed."""
+    # version-traceid-parentid-flags, e.g. 00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01
+    match = _TRACEPARENT.match(value.strip())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags, rest = match.groups()
+    # Version ff is forbidden; version 00 has exactly four fields, later versions may append more
+    if version == "ff" or (version == "00" and rest):
+        return None
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, int(flags, 16) & 1 == 1
+
+
+class TracingMiddleware:
+    """Root span per HTTP request, named after the matched route; feeds the request latency histogram."""
+
+    def __init__(self, app, skip=("/metrics", "/health")):
+        self.app = app
+        self.skip = skip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            return await self.app(scope, receive, send)
+
+        sampled = random.random() < TRACE_SAMPLE_RATE
+        trace_id = parent_id = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                parsed = _parse_traceparent(value.decode("latin-1"))
+                if parsed is not None:
+                    trace_id, parent_id, sampled = parsed
+                break
+        root = Span("http", sampled=sampled, trace_id=trace_id, parent_id=parent_id, kind=2,
+                    attributes={"http.method": scope["method"], "_local_root": True})
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _current_span.set(root)
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            root.name = f"{scope['method']} {route_path}"
+            root.set_attribute("http.route", route_path)
+            root.set_attribute("http.status_code", status["code"])
+            request_latency.observe((scope["method"], route_path, str(status["code"])), time.perf_counter() - root.start)
+            end_span(root, error=error, stage=False)
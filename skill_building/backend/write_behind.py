@@ -0,0 +1,151 @@
+"""
+Write-behind buffer for batched persistence.
+
+Handlers append items in O(1); a background task hands them to a
+`flush(items)` callable (a coroutine function, or a blocking function run
+in a worker thread) in one batch whenever `max_items` accumulate or
+`max_delay` seconds pass, whichever comes first. Failed batches are put
+back at the front of the buffer and retried on the next flush, and
+`stop()` drains whatever is left so a clean shutdown loses nothing.
+
+Nothing is retried forever: an item whose batch has failed `max_attempts`
+times is dropped, the buffer holds at most `max_pending` items (the
+oldest are dropped first), and anything a final flush at shutdown could
+not write is dropped too. Every dropped item is logged.
+"""
+import asyncio
+import os
+import threading
+
+WRITE_BEHIND_MAX_ITEMS = int(os.getenv("WRITE_BEHIND_MAX_ITEMS", "200"))
+WRITE_BEHIND_MAX_DELAY = float(os.getenv("WRITE_BEHIND_MAX_DELAY", "1.0"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+
+
+class WriteBehindBuffer:
+    def __init__(self, flush, max_items=WRITE_BEHIND_MAX_ITEMS, max_delay=WRITE_BEHIND_MAX_DELAY, name="write_behind",
+                 max_attempts=WRITE_BEHIND_MAX_ATTEMPTS, max_pending=WRITE_BEHIND_MAX_PENDING):
+        self.flush_fn = flush
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.name = name
+
+        # [item, failed attempts] pairs, oldest first
+        self._items = []
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._flush_lock = None
+        self._task = None
+        self.flushes = 0
+        self.flushed_items = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def add(self, item):
+        """Buffer one item; returns the number of items waiting to be written."""
+        with self._lock:
+            self._items.append([item, 0])
+            overflow = self._trim()
+            pending = len(self._items)
+        self._log_dropped(overflow, f"buffer over {self.max_pending} items")
+        if pending >= self.max_items and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return pending
+
+    @property
+    def pending(self):
+        return len(self._items)
+
+    def start(self):
+        """Start the background flusher. Call from a startup handler."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _drain(self):
+        with self._lock:
+            batch, self._items = self._items, []
+        return batch
+
+    def _trim(self):
+        """Drop the oldest entries beyond max_pending; call with the lock held."""
+        overflow = len(self._items) - self.max_pending
+        if overflow <= 0:
+            return []
+        dropped, self._items = self._items[:overflow], self._items[overflow:]
+        return dropped
+
+    def _requeue(self, batch):
+        """Put a failed batch back in front, minus items that have used up their attempts."""
+        for entry in batch:
+            entry[1] += 1
+        retry = [entry for entry in batch if entry[1] < self.max_attempts]
+        exhausted = [entry for entry in batch if entry[1] >= self.max_attempts]
+        with self._lock:
+            self._items[:0] = retry
+            overflow = self._trim()
+        self._log_dropped(exhausted, f"failed {self.max_attempts} times")
+        self._log_dropped(overflow, f"buffer over {self.max_pending} items")
+
+    def _log_dropped(self, entries, reason):
+        if not entries:
+            return
+        self.dropped += len(entries)
+        print(f"{self.name}: dropping {len(entries)} items ({reason}): {[item for item, _ in entries]!r}")
+
+    async def flush(self):
+        """Write everything currently buffered in one batch."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch = self._drain()
+            if not batch:
+                return 0
+            items = [item for item, _ in batch]
+            try:
+                if asyncio.iscoroutinefunction(self.flush_fn):
+                    await self.flush_fn(items)
+                else:
+                    await asyncio.to_thread(self.flush_fn, items)
+            except Exception as e:
+                self.errors += 1
+                self._requeue(batch)
+                print(f"{self.name}: flush of {len(batch)} items failed, will retry: {e}")
+                return 0
+            self.flushes += 1
+            self.flushed_items += len(batch)
+            return len(batch)
+
+    async def stop(self):
+        """Stop the background flusher and write out anything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        # The final flush failed: nothing will retry these
+        self._log_dropped(self._drain(), "unwritten at shutdown")
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "flushed_items": self.flushed_items,
+            "avg_batch_size": round(self.flushed_items / self.flushes, 1) if self.flushes else 0.0,
+            "errors": self.errors,
+            "dropped": self.dropped,
+        }